@@ -0,0 +1,154 @@
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
+from typing import Dict, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from services.sharding import ShardCoordinator
+import os
+import asyncio
+import hashlib
+import json
+import requests
+
+# Merges the caches of the analyzer instances registered in SHARD_COORDINATOR behind the
+# same /cameras/ endpoints as api.py: run one per cluster, e.g. uvicorn aggregator:app
+coordinator = ShardCoordinator(os.environ.get('SHARD_COORDINATOR', 'shards.db'),
+                               ttl=3 * float(os.environ.get('SHARD_HEARTBEAT_SECONDS', 5)))
+SHARD_TIMEOUT = float(os.environ.get('AGGREGATOR_SHARD_TIMEOUT', 5))
+
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+app = FastAPI()
+
+def fetch(url: str, params=None, headers: Optional[Dict] = None) -> requests.Response:
+    return session.get(url, params=params, headers=headers, timeout=SHARD_TIMEOUT)
+
+async def fetch_all(path: str, params=None,
+                    members: Optional[Dict[str, str]] = None) -> List[Tuple[str, requests.Response]]:
+    """GET path from every live instance concurrently; unreachable instances are skipped"""
+    if members is None:
+        members = await asyncio.to_thread(coordinator.members)
+    if not members:
+        raise HTTPException(status_code=503, detail="No analyzer instances registered")
+    outcomes = await asyncio.gather(*(asyncio.to_thread(fetch, url + path, params) for url in members.values()),
+                                    return_exceptions=True)
+    responses = []
+    for instance, outcome in zip(members, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Error fetching {path} from {instance}: {str(outcome)}")
+            continue
+        if 400 <= outcome.status_code < 500 and outcome.status_code != 404:
+            # The request itself is invalid; every instance would say the same
+            raise HTTPException(status_code=outcome.status_code, detail=outcome.json().get("detail"))
+        responses.append((instance, outcome))
+    return responses
+
+async def fetch_owner_first(camera_id: str, path: str, params=None, headers: Optional[Dict] = None,
+                            fallback: bool = True) -> requests.Response:
+    """GET path from the instance owning camera_id; with fallback, then from the others while they answer 404"""
+    members = await asyncio.to_thread(coordinator.members)
+    owner = coordinator.ring(members).owner(camera_id)
+    candidates = sorted(members, key=lambda instance: instance != owner) if fallback else [owner] if owner else []
+    response = None
+    for instance in candidates:
+        try:
+            response = await asyncio.to_thread(fetch, members[instance] + path, params, headers)
+        except requests.RequestException as e:
+            print(f"Error fetching {path} from {instance}: {str(e)}")
+            continue
+        if response.status_code != 404:
+            return response
+    if response is None:
+        raise HTTPException(status_code=503, detail="No analyzer instance reachable")
+    return response
+
+def relay(response: requests.Response) -> Response:
+    headers = {name: response.headers[name] for name in ('ETag',) if name in response.headers}
+    return Response(content=response.content, status_code=response.status_code,
+                    media_type=response.headers.get('Content-Type'), headers=headers)
+
+@app.get("/cameras/", response_model=List[Dict])
+async def get_all_cameras(request: Request,
+                          bbox: Optional[str] = Query(None, description="west,south,east,north in degrees"),
+                          lat: Optional[float] = None, lon: Optional[float] = None,
+                          radius_km: Optional[float] = Query(None, gt=0),
+                          min_congestion: Optional[float] = None,
+                          top: Optional[int] = Query(None, ge=1)):
+    """Cached results of all instances, with the same filters as an analyzer's /cameras/.
+
+    A camera is only taken from its owner on the ring, so a copy left on a
+    previous owner never shows up or takes a top slot.
+    """
+    members = await asyncio.to_thread(coordinator.members)
+    ring = coordinator.ring(members)
+    items = []
+    for instance, response in await fetch_all('/cameras/', request.query_params, members):
+        if response.status_code == 200:
+            items += [item for item in response.json() if ring.owner(item["camera_id"]) == instance]
+    items.sort(key=lambda item: item["camera_id"])
+    if min_congestion is not None or top is not None:
+        items.sort(key=lambda item: item["congestion_percentage"], reverse=True)
+        items = items[:top] if top is not None else items
+    elif radius_km is not None:
+        items.sort(key=lambda item: item["distance_km"])
+    content = json.dumps(items, ensure_ascii=False).encode('utf-8')
+    etag = f'"{hashlib.blake2b(content, digest_size=12).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=content, media_type="application/json", headers={"ETag": etag})
+
+@app.get("/cameras/{camera_id}", response_model=Dict)
+async def get_camera(camera_id: str):
+    # Owner only: a previous owner's copy would be stale
+    return relay(await fetch_owner_first(camera_id, f"/cameras/{camera_id}", fallback=False))
+
+@app.get("/cameras/{camera_id}/history", response_model=List[Dict])
+async def get_camera_history(camera_id: str, request: Request):
+    """History merged over all instances, since a camera's samples stay where they were recorded"""
+    buckets: Dict[str, List[Dict]] = {}
+    for _, response in await fetch_all(f"/cameras/{camera_id}/history", request.query_params):
+        if response.status_code == 200:
+            for point in response.json():
+                buckets.setdefault(point["timestamp"], []).append(point)
+    history = []
+    for timestamp, points in sorted(buckets.items()):
+        samples = sum(point["samples"] for point in points)
+        merged = {
+            "timestamp": timestamp,
+            "samples": samples,
+            "congestion": round(sum(point["congestion"] * point["samples"] for point in points) / samples, 2),
+            "congestion_min": min(point["congestion_min"] for point in points),
+            "congestion_max": max(point["congestion_max"] for point in points),
+        }
+        for key, digits in (("vehicle_count", 2), ("latency", 3)):
+            # Weighted by the samples of the points that have a value
+            valued = [point for point in points if point[key] is not None]
+            weight = sum(point["samples"] for point in valued)
+            merged[key] = round(sum(point[key] * point["samples"] for point in valued) / weight, digits) \
+                if weight else None
+        history.append(merged)
+    return history
+
+@app.get("/images/{camera_id}.jpg")
+async def get_camera_image(camera_id: str, request: Request, width: Optional[int] = None):
+    headers = {"If-None-Match": request.headers["if-none-match"]} if "if-none-match" in request.headers else None
+    return relay(await fetch_owner_first(camera_id, f"/images/{camera_id}.jpg",
+                                         {"width": width} if width is not None else None, headers))
+
+@app.get("/status")
+async def get_status():
+    """Live instances, the cameras each owns and their own status"""
+    instances = {}
+    for instance, response in await fetch_all('/status'):
+        status = response.json()
+        instances[instance] = {
+            "cameras_cached": status.get("cameras_cached"),
+            "last_update": status.get("last_update"),
+            "shard": status.get("shard"),
+        }
+    return {"instances": instances}
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "instances": len(await asyncio.to_thread(coordinator.members))}
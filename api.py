@@ -1,91 +1,475 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.staticfiles import StaticFiles
-import json
-from typing import List, Dict
-from main import process_camera
+import time
+# Start of the startup timing breakdown, before any heavy import
+STARTUP_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Optional, Tuple
+from main import create_pipeline, create_worker_pool, invalidate_camera, motion_gate, process_cameras
+from models.yolo_model import YOLOModel
+from services.image_fetcher import ImageNotModified
+from services.camera_index import CameraIndex
+from services.camera_registry import CameraRegistry
+from services.history_store import HistoryStore
+from services.live_updates import LiveUpdates, format_event
+from services.refresh_scheduler import RefreshScheduler
+from services.sharding import HashRing, ShardCoordinator
+from services.metrics import ERRORS, REFRESH_SECONDS, registry as metrics_registry
+from services.profiler import SamplingProfiler
+from services.readiness import Readiness
+from visualization.render_cache import RenderCache
 import os
 import asyncio
-from datetime import datetime, timedelta
-import time
+import hashlib
+import json
+import socket
+from datetime import datetime
 from threading import Lock
 
-app = FastAPI()
+readiness = Readiness(STARTUP_STARTED)
+readiness.record('imports', time.perf_counter() - STARTUP_STARTED)
 
-# Mount the result directory for static file serving
-app.mount("/images", StaticFiles(directory="result"), name="images")
+app = FastAPI()
 
-# Load ROI data
-try:
-    with open('camera_coordinates.json', 'r') as f:
-        roi_data = json.load(f)
-except FileNotFoundError:
-    roi_data = []
+# Camera ROIs and metadata, reloaded when the files change
+with readiness.step('registry'):
+    registry = CameraRegistry('camera_coordinates.json', 'cam.json')
 
 # Create result directory if it doesn't exist
 os.makedirs('result', exist_ok=True)
 
+# Result images are rendered on request (lazy) or written to result/ every cycle (eager)
+render_cache = None
+if os.environ.get('RENDER_MODE', 'lazy') == 'lazy':
+    render_cache = RenderCache(
+        max_entries=int(os.environ.get('RENDER_CACHE_SIZE', 64)),
+        jpeg_quality=int(os.environ.get('RENDER_JPEG_QUALITY', 90)),
+        max_width=int(os.environ.get('RENDER_MAX_WIDTH', 0)) or None,
+        prerender=[camera_id for camera_id in os.environ.get('RENDER_PRERENDER', '').split(',') if camera_id])
+
+# Congestion time series on disk; HISTORY_DB= (empty) disables it
+history_store = None
+if os.environ.get('HISTORY_DB', 'history.db'):
+    with readiness.step('history_store'):
+        history_store = HistoryStore(
+            os.environ.get('HISTORY_DB', 'history.db'),
+            raw_retention=float(os.environ.get('HISTORY_RAW_RETENTION_DAYS', 7)) * 86400 or None)
+
+# Optional worker processes for inference and post-processing (WORKER_INFERENCE_PROCESSES > 0)
+worker_pool = create_worker_pool(batch_size=int(os.environ.get('PIPELINE_BATCH_SIZE', 8)))
+
+# The model is loaded and run once on a blank frame of this size (WIDTHxHEIGHT) in the background
+# at startup; MODEL_WARMUP=0 only loads it
+MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') == '1'
+WARMUP_WIDTH, WARMUP_HEIGHT = (int(value) for value in os.environ.get('WARMUP_RESOLUTION', '512x288').split('x'))
+
+# Refresh pipeline concurrency per stage
+pipeline = create_pipeline(
+    fetch_workers=int(os.environ.get('PIPELINE_FETCH_WORKERS', 8)),
+    postprocess_workers=int(os.environ.get('PIPELINE_POSTPROCESS_WORKERS', 4)),
+    batch_size=int(os.environ.get('PIPELINE_BATCH_SIZE', 8)),
+    queue_size=int(os.environ.get('PIPELINE_QUEUE_SIZE', 32)),
+    render_cache=render_cache,
+    worker_pool=worker_pool)
+
 # Cache for storing results
 class CameraCache:
-    def __init__(self):
+    """Latest result per camera, with a spatial and congestion index kept in step with every write.
+
+    Each write stamps the camera with a new version, so a query's ETag only
+    changes when one of the cameras in its result changed. New results are
+    passed to on_update(camera_id, version, data) for the live subscribers.
+    """
+    def __init__(self, index_cell_size: float = 0.01,
+                 on_update: Optional[Callable[[str, int, Dict], None]] = None):
         self.cache = {}
+        self.versions: Dict[str, int] = {}
+        self.version = 0
+        self.index = CameraIndex(index_cell_size)
+        self.on_update = on_update
         self.last_update = None
         self.lock = Lock()
     
+    def _stamp(self, camera_id: str):
+        self.version += 1
+        self.versions[camera_id] = self.version
+        self.last_update = datetime.now()
+
     def update(self, camera_id: str, data: Dict):
         with self.lock:
             self.cache[camera_id] = data
-            self.last_update = datetime.now()
+            self._stamp(camera_id)
+            self.index.update(camera_id, data.get("latitude"), data.get("longitude"),
+                              data["congestion_percentage"])
+            if self.on_update is not None:
+                # Under the lock, so events leave in version order
+                self.on_update(camera_id, self.version, data)
     
+    def touch(self, camera_id: str) -> bool:
+        """Mark a camera's cached result as still current; False if nothing is cached"""
+        with self.lock:
+            data = self.cache.get(camera_id)
+            if data is None:
+                return False
+            self.cache[camera_id] = {**data, "last_checked": datetime.now().isoformat()}
+            self._stamp(camera_id)
+            return True
+
+    def query(self, bbox: Optional[Tuple[float, float, float, float]] = None,
+              near: Optional[Tuple[float, float, float]] = None, min_congestion: Optional[float] = None,
+              top: Optional[int] = None) -> Tuple[List[Dict], str]:
+        """Cached results matching all given filters, and their ETag.
+
+        bbox is (west, south, east, north) in degrees, near (latitude, longitude,
+        radius in km). Results come most congested first when min_congestion or
+        top is given, else nearest first for near, else in cache order; radius
+        results carry their distance_km.
+        """
+        with self.lock:
+            camera_ids = None
+            distances = {}
+            if near is not None:
+                distances = dict(self.index.within(*near))
+                camera_ids = list(distances)
+            if bbox is not None:
+                west, south, east, north = bbox
+                inside = set(self.index.in_bbox(south, west, north, east))
+                camera_ids = sorted(inside) if camera_ids is None else [
+                    camera_id for camera_id in camera_ids if camera_id in inside]
+            if min_congestion is not None or top is not None:
+                ranked = self.index.most_congested(min_congestion)
+                if camera_ids is not None:
+                    selected = set(camera_ids)
+                    ranked = [camera_id for camera_id in ranked if camera_id in selected]
+                camera_ids = ranked[:top] if top is not None else ranked
+            if camera_ids is None:
+                camera_ids = list(self.cache)
+            camera_ids = [camera_id for camera_id in camera_ids if camera_id in self.cache]
+            items = [{**self.cache[camera_id], "distance_km": round(distances[camera_id], 3)}
+                     if camera_id in distances else self.cache[camera_id] for camera_id in camera_ids]
+            digest = hashlib.blake2b(repr((bbox, near, min_congestion, top)).encode(), digest_size=12)
+            for camera_id in camera_ids:
+                digest.update(f"{camera_id}:{self.versions[camera_id]};".encode())
+        return items, f'"{digest.hexdigest()}"'
+
+    def remove(self, camera_id: str) -> bool:
+        """Forget a camera's result, e.g. once another shard owns it; False if nothing was cached"""
+        with self.lock:
+            if self.cache.pop(camera_id, None) is None:
+                return False
+            del self.versions[camera_id]
+            self.index.remove(camera_id)
+            self.last_update = datetime.now()
+            return True
+
+    def since(self, version: int, camera_ids: Optional[List[str]] = None) -> List[Tuple[int, Dict]]:
+        """(version, data) of the cameras written after version, oldest first"""
+        with self.lock:
+            selected = self.cache if camera_ids is None else [
+                camera_id for camera_id in camera_ids if camera_id in self.cache]
+            changed = [(self.versions[camera_id], self.cache[camera_id]) for camera_id in selected
+                       if self.versions[camera_id] > version]
+        return sorted(changed, key=lambda item: item[0])
+
     def get_all(self) -> List[Dict]:
-        return list(self.cache.values())
+        with self.lock:
+            return list(self.cache.values())
     
     def get_one(self, camera_id: str) -> Dict:
         return self.cache.get(camera_id)
-    
-    def needs_update(self) -> bool:
-        if self.last_update is None:
-            return True
-        return (datetime.now() - self.last_update) > timedelta(seconds=15)
 
-camera_cache = CameraCache()
+# Server-Sent Events push of new results; slow clients keep only the newest
+# LIVE_MAX_PENDING cameras, so they never hold up the refresh loop
+live_updates = LiveUpdates(max_pending=int(os.environ.get('LIVE_MAX_PENDING', 256)),
+                           max_subscribers=int(os.environ.get('LIVE_MAX_SUBSCRIBERS', 10000)))
+LIVE_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_HEARTBEAT_SECONDS', 15))
+
+# Spatial index cells of CAMERA_INDEX_CELL_DEGREES (0.01 is about 1.1 km)
+camera_cache = CameraCache(float(os.environ.get('CAMERA_INDEX_CELL_DEGREES', 0.01)),
+                           on_update=live_updates.publish)
+
+# Per-camera refresh intervals, error backoff and the global inference budget
+scheduler = RefreshScheduler(
+    base_interval=float(os.environ.get('SCHEDULER_BASE_INTERVAL', 15)),
+    min_interval=float(os.environ.get('SCHEDULER_MIN_INTERVAL', 5)),
+    max_interval=float(os.environ.get('SCHEDULER_MAX_INTERVAL', 120)),
+    max_backoff=float(os.environ.get('SCHEDULER_MAX_BACKOFF', 600)),
+    change_threshold=float(os.environ.get('SCHEDULER_CHANGE_THRESHOLD', 5)),
+    budget_fps=float(os.environ.get('INFERENCE_BUDGET_FPS', 0)))
+SCHEDULER_MAX_BATCH = int(os.environ.get('SCHEDULER_MAX_BATCH', 64))
+SCHEDULER_MAX_IN_FLIGHT = int(os.environ.get('SCHEDULER_MAX_IN_FLIGHT', 2))
+
+# Sharding: with SHARD_COORDINATOR (a SQLite file shared with the other analyzers and
+# the aggregator) this instance only refreshes the cameras its SHARD_ID owns on the ring
+SHARD_COORDINATOR = os.environ.get('SHARD_COORDINATOR', '')
+SHARD_ID = os.environ.get('SHARD_ID') or f"{socket.gethostname()}-{os.getpid()}"
+SHARD_URL = os.environ.get('SHARD_URL', 'http://127.0.0.1:8000')
+SHARD_HEARTBEAT_SECONDS = float(os.environ.get('SHARD_HEARTBEAT_SECONDS', 5))
+shard_coordinator = ShardCoordinator(SHARD_COORDINATOR, ttl=3 * SHARD_HEARTBEAT_SECONDS) if SHARD_COORDINATOR else None
+shard_ring: Optional[HashRing] = None
+_owned_cameras: Tuple = (None, (), [], frozenset())
+
+# Scrape-time gauges next to the pipeline instrumentation
+metrics_registry.gauge('traffic_cameras_cached', 'Cameras with a cached result').set_function(
+    lambda: {(): len(camera_cache.cache)})
+metrics_registry.gauge('traffic_live_subscribers', 'Connected live update subscribers').set_function(
+    lambda: {(): live_updates.stats()["subscribers"]})
+metrics_registry.gauge('traffic_cameras_overdue', 'Scheduled cameras past their due time').set_function(
+    lambda: {(): scheduler.stats()["cameras_overdue"]})
+
+# Stack sampling of all threads, started and stopped at runtime via /debug/profile;
+# PROFILER_ENABLED=1 adds the endpoints; they are unauthenticated, so keep them off on public deployments
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '0') == '1'
+profiler = SamplingProfiler()
+
+def store_result(camera_id: str, outcome):
+    scheduler.complete(camera_id, outcome)
+    if isinstance(outcome, ImageNotModified):
+        # Same snapshot as last cycle: reuse the cached result, or force a
+        # fresh download next cycle if there is nothing to reuse
+        if not camera_cache.touch(camera_id):
+            invalidate_camera(camera_id)
+        return
+    if isinstance(outcome, Exception):
+        invalidate_camera(camera_id)
+        return
+    if not owns(camera_id):
+        # Finished after the camera moved to another shard
+        return
+    output_path, congestion = outcome
+    if history_store is not None:
+        history_store.record(camera_id, time.time(), congestion,
+                             getattr(outcome, 'vehicle_count', None), getattr(outcome, 'latency', None))
+    occupancy = getattr(outcome, 'occupancy', None) or {}
+    now = datetime.now().isoformat()
+    camera = registry.get(camera_id)
+    camera_cache.update(camera_id, {
+        "camera_id": camera_id,
+        "location": camera.location if camera else None,
+        "latitude": camera.latitude if camera else None,
+        "longitude": camera.longitude if camera else None,
+        "image_url": f"/images/{camera_id}.jpg",
+        "congestion_percentage": round(congestion, 2),
+        "confident_congestion": round(occupancy["confident_congestion"], 2) if occupancy else None,
+        "vehicles_in_roi": occupancy.get("vehicles_in_roi"),
+        "vehicles": occupancy.get("vehicles", {}),
+        "area_share": {name: round(share, 2) for name, share in occupancy.get("area_share", {}).items()},
+        "last_updated": now,
+        "last_checked": now
+    })
+
+async def refresh_batch(camera_ids: List[str]):
+    """Refresh a batch of due cameras off the event loop and reschedule each of them"""
+    try:
+        with REFRESH_SECONDS.time():
+            outcomes = await asyncio.to_thread(
+                process_cameras, camera_ids, registry, pipeline=pipeline, on_result=store_result)
+    except Exception as e:
+        print(f"Error in update task: {str(e)}")
+        ERRORS.inc(stage='refresh')
+        outcomes = {camera_id: e for camera_id in camera_ids}
+    unchanged = 0
+    for camera_id, outcome in outcomes.items():
+        # Cameras rescheduled by store_result are skipped here
+        scheduler.complete(camera_id, outcome)
+        if isinstance(outcome, ImageNotModified):
+            unchanged += 1
+        elif isinstance(outcome, Exception):
+            print(f"Error processing camera {camera_id}: {str(outcome)}")
+    print(f"Refreshed {len(outcomes)} cameras: {len(outcomes) - unchanged} processed, {unchanged} unchanged")
+    if not readiness.first_refresh.is_set():
+        readiness.mark_ready(readiness.first_refresh, 'first_refresh')
+        print(f"Startup: {readiness.summary()}")
+
+def warm_up_model():
+    """Load the model (in every worker process, if any) and run a dummy batch at the expected resolution"""
+    shape = (WARMUP_HEIGHT, WARMUP_WIDTH, 3)
+    batch_size = int(os.environ.get('PIPELINE_BATCH_SIZE', 8))
+    try:
+        if worker_pool is not None:
+            with readiness.step('model_warmup'):
+                worker_pool.warm_up(shape)
+        else:
+            with readiness.step('model_load'):
+                model = YOLOModel()
+            if MODEL_WARMUP:
+                with readiness.step('model_warmup'):
+                    model.warm_up(shape, batch_size)
+        readiness.mark_ready(readiness.model_ready, 'model_ready')
+    except Exception as e:
+        readiness.error = str(e)
+        print(f"Error warming up model: {str(e)}")
+
+def owned_camera_ids() -> List[str]:
+    """The registry cameras this instance refreshes: all of them unless sharded"""
+    global _owned_cameras
+    camera_ids = registry.camera_ids()
+    if shard_coordinator is None:
+        return camera_ids
+    if shard_ring is None:
+        return []
+    ring, known, owned, _ = _owned_cameras
+    if ring is not shard_ring or known != tuple(camera_ids):
+        owned = shard_ring.owned(camera_ids, SHARD_ID)
+        _owned_cameras = (shard_ring, tuple(camera_ids), owned, frozenset(owned))
+    return owned
+
+def owns(camera_id: str) -> bool:
+    if shard_coordinator is None:
+        return True
+    owned_camera_ids()
+    return camera_id in _owned_cameras[3]
+
+def evict_unowned():
+    """Drop cached results of cameras that moved to another shard, so no stale copy is served"""
+    for camera_id in [item["camera_id"] for item in camera_cache.get_all() if not owns(item["camera_id"])]:
+        camera_cache.remove(camera_id)
+
+async def sync_shard():
+    """Heartbeat this instance and pick up membership changes of the ring"""
+    global shard_ring
+    try:
+        await asyncio.to_thread(shard_coordinator.heartbeat, SHARD_ID, SHARD_URL)
+        ring = await asyncio.to_thread(shard_coordinator.ring)
+    except Exception as e:
+        print(f"Error syncing shard membership: {str(e)}")
+        ERRORS.inc(stage='shard')
+        return
+    if shard_ring is None or ring.instances != shard_ring.instances:
+        shard_ring = ring
+        evict_unowned()
+        print(f"Shard {SHARD_ID}: {len(ring.instances)} instances, "
+              f"owning {len(owned_camera_ids())} of {len(registry.camera_ids())} cameras")
+
+async def follow_shard():
+    while True:
+        await asyncio.sleep(SHARD_HEARTBEAT_SECONDS)
+        await sync_shard()
 
 async def update_cache():
-    """Background task to update cache every 15 seconds"""
+    """Background task dispatching cameras as the scheduler makes them due"""
+    # Load the model off the event loop first, so /healthz and /readyz answer meanwhile
+    await asyncio.to_thread(warm_up_model)
+    if shard_coordinator is not None:
+        # Join the ring only once the model is warm, so cameras never move to an instance that cannot serve yet
+        await sync_shard()
+        asyncio.create_task(follow_shard())
+    in_flight = set()
     while True:
         try:
-            if camera_cache.needs_update():
-                print("Updating cache...")
-                for camera_data in roi_data:
-                    camera_id = camera_data['camID']
-                    try:
-                        output_path, congestion = process_camera(camera_id, roi_data)
-                        camera_cache.update(camera_id, {
-                            "camera_id": camera_id,
-                            "image_url": f"/images/{camera_id}.jpg",
-                            "congestion_percentage": round(congestion, 2),
-                            "last_updated": datetime.now().isoformat()
-                        })
-                    except Exception as e:
-                        print(f"Error processing camera {camera_id}: {str(e)}")
-                        continue
+            scheduler.sync(owned_camera_ids())
+            if len(in_flight) >= SCHEDULER_MAX_IN_FLIGHT:
+                await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            camera_ids = scheduler.pop_due(SCHEDULER_MAX_BATCH)
+            if camera_ids:
+                # Run batches concurrently so slow cameras only hold up their own batch
+                task = asyncio.create_task(refresh_batch(camera_ids))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                continue
+            wait = scheduler.next_due_in()
         except Exception as e:
             print(f"Error in update task: {str(e)}")
-        
-        await asyncio.sleep(15)  # Wait for 15 seconds before next update
+            wait = None
+        await asyncio.sleep(min(wait if wait is not None else 1.0, 1.0))
 
 @app.on_event("startup")
 async def startup_event():
     """Start the background task when the application starts"""
+    live_updates.bind(asyncio.get_running_loop())
     asyncio.create_task(update_cache())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if shard_coordinator is not None:
+        # Leave the ring right away instead of after the heartbeat expires
+        shard_coordinator.leave(SHARD_ID)
+    if worker_pool is not None:
+        worker_pool.close()
+    if history_store is not None:
+        history_store.close()
+
+def parse_floats(value: Optional[str], count: int, name: str) -> Optional[Tuple[float, ...]]:
+    if value is None:
+        return None
+    try:
+        numbers = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        numbers = ()
+    if len(numbers) != count:
+        raise HTTPException(status_code=400, detail=f"{name} expects {count} comma-separated numbers")
+    return numbers
+
+def stream_json_array(items: List[Dict], chunk_size: int = 64) -> Iterator[bytes]:
+    """Encode items as a JSON array chunk by chunk, so large responses start right away"""
+    yield b'['
+    for start in range(0, len(items), chunk_size):
+        chunk = ','.join(json.dumps(item, ensure_ascii=False) for item in items[start:start + chunk_size])
+        yield (chunk if start == 0 else ',' + chunk).encode('utf-8')
+    yield b']'
+
 @app.get("/cameras/", response_model=List[Dict])
-async def get_all_cameras():
-    """Get cached traffic data for all cameras"""
-    # If cache is empty, wait for first update
-    if not camera_cache.cache:
-        return []
-    
-    return camera_cache.get_all()
+async def get_all_cameras(request: Request,
+                          bbox: Optional[str] = Query(None, description="west,south,east,north in degrees"),
+                          lat: Optional[float] = None, lon: Optional[float] = None,
+                          radius_km: Optional[float] = Query(None, gt=0),
+                          min_congestion: Optional[float] = None,
+                          top: Optional[int] = Query(None, ge=1)):
+    """Get cached traffic data for all cameras, or those matching every given filter.
+
+    Filters: a bounding box, a radius around lat/lon, a minimum congestion and
+    the top N most congested. Responses carry an ETag; a matching
+    If-None-Match gets 304 Not Modified.
+    """
+    near = None
+    if radius_km is not None or lat is not None or lon is not None:
+        if None in (lat, lon, radius_km):
+            raise HTTPException(status_code=400, detail="lat, lon and radius_km go together")
+        near = (lat, lon, radius_km)
+    items, etag = camera_cache.query(parse_floats(bbox, 4, 'bbox'), near, min_congestion, top)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return StreamingResponse(stream_json_array(items), media_type="application/json", headers={"ETag": etag})
+
+@app.get("/cameras/events")
+async def camera_events(request: Request, ids: Optional[str] = Query(None, description="comma-separated camera IDs"),
+                        last_event_id: Optional[int] = None, snapshot: bool = True):
+    """Server-Sent Events stream of new camera results, optionally only for some camera IDs.
+
+    Starts with the current results (or, on reconnect with Last-Event-ID, the
+    ones written since), then pushes each result as it is stored. Comment
+    lines are sent every LIVE_HEARTBEAT_SECONDS to keep idle connections open.
+    """
+    camera_ids = None
+    if ids is not None:
+        camera_ids = [camera_id for camera_id in ids.split(',') if camera_id]
+        if not camera_ids:
+            raise HTTPException(status_code=400, detail="ids must list at least one camera ID")
+    header_id = request.headers.get("last-event-id")
+    if header_id is not None:
+        try:
+            last_event_id = int(header_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be an integer")
+    subscriber = live_updates.subscribe(camera_ids)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many live subscribers")
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            # Subscribed first, so nothing written meanwhile is missed; duplicates carry the same id
+            if snapshot or last_event_id is not None:
+                events = camera_cache.since(last_event_id or 0, camera_ids)
+                yield ''.join(format_event(version, data) for version, data in events) or ': connected\n\n'
+            while True:
+                batch = await subscriber.next_batch(LIVE_HEARTBEAT_SECONDS)
+                yield ''.join(batch) if batch else ': keepalive\n\n'
+        finally:
+            live_updates.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/cameras/{camera_id}", response_model=Dict)
 async def get_camera(camera_id: str):
@@ -95,15 +479,150 @@ async def get_camera(camera_id: str):
         raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found or not yet processed")
     return result
 
+# Steps offered when ?step= is omitted; the smallest one giving at most 1000 points is used
+HISTORY_AUTO_STEPS = (60, 900, 3600, 86400)
+HISTORY_STEP_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_time(value: str) -> float:
+    # Unix seconds or an ISO 8601 date/time
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {value}")
+
+def parse_step(value: str) -> int:
+    # Seconds, or a number with an s/m/h/d suffix such as 15m
+    unit = HISTORY_STEP_UNITS.get(value[-1:].lower())
+    try:
+        step = int(value[:-1]) * unit if unit else int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid step: {value}")
+    if step < 1:
+        raise HTTPException(status_code=400, detail="step must be positive")
+    return step
+
+@app.get("/cameras/{camera_id}/history", response_model=List[Dict])
+async def get_camera_history(camera_id: str,
+                             start: Optional[str] = Query(None, alias="from"),
+                             end: Optional[str] = Query(None, alias="to"),
+                             step: Optional[str] = None):
+    """Congestion history of a camera, averaged per step.
+
+    from/to take unix seconds or ISO 8601 times (default: the last 24 hours);
+    step takes seconds or 1m/15m/1h style values. Multiples of 1m, 15m and 1h
+    are answered from pre-aggregated rollups.
+    """
+    if history_store is None:
+        raise HTTPException(status_code=404, detail="History is disabled")
+    end_time = parse_time(end) if end else time.time()
+    start_time = parse_time(start) if start else end_time - 86400
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    if step:
+        step_seconds = parse_step(step)
+    else:
+        step_seconds = next((candidate for candidate in HISTORY_AUTO_STEPS
+                             if (end_time - start_time) / candidate <= 1000), HISTORY_AUTO_STEPS[-1])
+    points = await asyncio.to_thread(history_store.history, camera_id, start_time, end_time, step_seconds)
+    return [{
+        **point,
+        "timestamp": datetime.fromtimestamp(point["timestamp"]).isoformat(),
+        "congestion": round(point["congestion"], 2),
+        "congestion_min": round(point["congestion_min"], 2),
+        "congestion_max": round(point["congestion_max"], 2),
+        "vehicle_count": round(point["vehicle_count"], 2) if point["vehicle_count"] is not None else None,
+        "latency": round(point["latency"], 3) if point["latency"] is not None else None,
+    } for point in points]
+
+@app.get("/images/{camera_id}.jpg")
+async def get_camera_image(camera_id: str, request: Request, width: Optional[int] = None):
+    """Result image of a camera, rendered from the latest analyzed frame on first request.
+
+    ?width= returns a downscaled thumbnail.
+    """
+    if width is not None and width < 1:
+        raise HTTPException(status_code=400, detail="width must be positive")
+    rendered = await asyncio.to_thread(render_cache.get_jpeg, camera_id, width) if render_cache else None
+    if rendered is None:
+        # Fall back to an image written by an eager cycle or by main.py
+        path = os.path.join('result', f'{camera_id}.jpg')
+        if os.path.basename(path) != f'{camera_id}.jpg' or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail=f"No image for camera {camera_id}")
+        return FileResponse(path, media_type="image/jpeg")
+    version, jpeg = rendered
+    etag = f'"{camera_id}-{version}-{width or 0}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=jpeg, media_type="image/jpeg", headers={"ETag": etag})
+
 @app.get("/status")
 async def get_status():
     """Get the cache status"""
     return {
         "last_update": camera_cache.last_update.isoformat() if camera_cache.last_update else None,
         "cameras_cached": len(camera_cache.cache),
-        "next_update_in": 15 - ((datetime.now() - camera_cache.last_update).seconds if camera_cache.last_update else 15)
+        "next_update_in": scheduler.next_due_in(),
+        "scheduler": scheduler.stats(),
+        "motion_gate": motion_gate.stats(),
+        "history": history_store.stats() if history_store is not None else None,
+        "live": live_updates.stats(),
+        "shard": {
+            "id": SHARD_ID,
+            "instances": shard_ring.instances if shard_ring is not None else [],
+            "cameras_owned": len(owned_camera_ids()),
+        } if shard_coordinator is not None else None
     }
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok", "uptime": readiness.report()["uptime"]}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the model is warm and the first refresh filled the cache, else 503"""
+    report = readiness.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Stage latencies, per-camera outcomes, queue depths and cache counters in Prometheus format"""
+    return Response(content=metrics_registry.render(), media_type=metrics_registry.content_type)
+
+def require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+
+@app.post("/debug/profile/start")
+async def start_profile(seconds: float, interval_ms: float = 10):
+    """Start sampling all thread stacks every interval_ms (at least 5) for seconds (at most 300)"""
+    require_profiler()
+    try:
+        started = profiler.start(interval_ms / 1000, seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not started:
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    return profiler.status()
+
+@app.post("/debug/profile/stop", response_class=PlainTextResponse)
+async def stop_profile():
+    """Stop sampling and return the folded stacks"""
+    require_profiler()
+    await asyncio.to_thread(profiler.stop)
+    return profiler.folded()
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def get_profile():
+    """Folded stacks collected so far, for flamegraph.pl or speedscope"""
+    require_profiler()
+    return PlainTextResponse(profiler.folded(), headers={
+        "X-Profile-Samples": str(profiler.samples), "X-Profile-Running": str(profiler.running).lower()})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,74 @@
+import argparse
+import glob
+import sys
+import time
+import cv2
+import numpy as np
+from bench.common import load_roi_data, time_samples
+from models.yolo_model import BACKENDS, PRECISIONS, YOLOModel
+from utils.geometry import RegionOfInterest
+import main
+
+def load_backend(backend: str, precision: str, threads: int) -> float:
+    """Install a fresh YOLOModel singleton for backend, exporting it if needed; returns the load time in seconds"""
+    YOLOModel.backend, YOLOModel.precision, YOLOModel.threads = backend, precision, threads
+    YOLOModel._instance = None
+    start = time.perf_counter()
+    YOLOModel()
+    return time.perf_counter() - start
+
+def measure(frames, rois, batch_size: int, conf: float):
+    """Congestion of every frame against every ROI, and the detections per frame"""
+    results = YOLOModel().predict_batch(frames, batch_size=batch_size, conf=conf, verbose=False)
+    congestion = np.array([[main.measure_congestion(frame, result, roi)[0] for roi in rois]
+                           for frame, result in zip(frames, results)])
+    counts = np.array([YOLOModel.count(result) for result in results])
+    return congestion, counts
+
+def main_compare():
+    parser = argparse.ArgumentParser(
+        description="Compare inference backends on the sample images: latency and congestion agreement")
+    parser.add_argument('--backends', nargs='+', default=['torch:fp32', 'onnx:fp32', 'openvino:fp32'],
+                        help="backend:precision pairs; the first one is the reference, "
+                             f"backends {BACKENDS}, precisions {tuple(PRECISIONS)}")
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=0, help="intra-op threads per backend, 0 = runtime default")
+    parser.add_argument('--conf', type=float, default=0.25, help="detection confidence threshold")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help="maximum allowed congestion difference to the reference in percentage points")
+    args = parser.parse_args()
+
+    frames = [cv2.imread(path) for path in sorted(glob.glob(args.images))]
+    if not frames:
+        raise SystemExit(f"No images matched {args.images}")
+    rois = [RegionOfInterest(item['cordinate']) for item in load_roi_data()]
+
+    failed = False
+    reference = None
+    print(f"{'backend':>18} {'load s':>7} {'ms/frame':>9} {'p95 ms':>8} {'frames/s':>9} "
+          f"{'mean |diff| pp':>15} {'max |diff| pp':>14} {'count diff':>11}")
+    for spec in args.backends:
+        backend, _, precision = spec.partition(':')
+        load_seconds = load_backend(backend, precision or 'fp32', args.threads)
+        samples = np.array(time_samples(
+            lambda: YOLOModel().predict_batch(frames, batch_size=args.batch_size, conf=args.conf, verbose=False),
+            args.iterations)) / len(frames)
+        congestion, counts = measure(frames, rois, args.batch_size, args.conf)
+        if reference is None:
+            reference = congestion, counts
+        diffs = np.abs(congestion - reference[0])
+        count_diff = np.abs(counts - reference[1]).max()
+        failed = failed or diffs.max() > args.tolerance
+        print(f"{spec:>18} {load_seconds:>7.2f} {np.median(samples):>9.2f} {np.percentile(samples, 95):>8.2f} "
+              f"{1000 / np.median(samples):>9.1f} {diffs.mean():>15.3f} {diffs.max():>14.3f} {count_diff:>11}")
+
+    if failed:
+        print(f"FAIL: a backend differs from {args.backends[0]} by more than {args.tolerance} pp")
+        sys.exit(1)
+    print(f"OK: all backends within {args.tolerance} pp of {args.backends[0]} "
+          f"on {len(frames)} images x {len(rois)} ROIs")
+
+if __name__ == "__main__":
+    main_compare()
@@ -0,0 +1,38 @@
+import argparse
+import glob
+import time
+import cv2
+from models.yolo_model import YOLOModel
+
+def load_frames(pattern: str, count: int):
+    images = [cv2.imread(path) for path in sorted(glob.glob(pattern))]
+    images = [image for image in images if image is not None]
+    if not images:
+        raise SystemExit(f"No images matched {pattern}")
+    return [images[i % len(images)] for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure YOLO throughput at different batch sizes")
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--cameras', type=int, default=32, help="frames per simulated refresh cycle")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.cameras)
+    yolo_model = YOLOModel()
+    yolo_model.predict_batch(frames[:1], batch_size=1, verbose=False)  # warm-up
+
+    print(f"{'batch':>6} {'cycle s':>8} {'cameras/s':>10} {'speedup':>8}")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            yolo_model.predict_batch(frames, batch_size=batch_size, verbose=False)
+        cycle = (time.perf_counter() - start) / args.repeats
+        throughput = len(frames) / cycle
+        baseline = baseline or throughput
+        print(f"{batch_size:>6} {cycle:>8.3f} {throughput:>10.2f} {throughput / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
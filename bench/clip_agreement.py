@@ -0,0 +1,55 @@
+import argparse
+import sys
+import numpy as np
+from bench.common import load_roi_data, synthetic_segments, time_call
+from utils.geometry import GeometryCalculator, RegionOfInterest
+from services.congestion_analyzer import CongestionAnalyzer
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the analytic clip mode against the raster modes and compare their cost")
+    parser.add_argument('--segments', type=int, nargs='+', default=[5, 20, 60])
+    # The raster modes count every pixel the outline touches, so they read
+    # slightly high on small vehicles; the analytic area is the exact one
+    parser.add_argument('--tolerance', type=float, default=5.0,
+                        help="maximum allowed difference in percentage points")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--no-union', action='store_true', help="skip the shapely exact-union check")
+    args = parser.parse_args()
+
+    image_size = (288, 512)
+    geometry_calculator = GeometryCalculator()
+    pairs = [('sum', CongestionAnalyzer(geometry_calculator, mode='sum'),
+              CongestionAnalyzer(geometry_calculator, mode='clip'))]
+    if not args.no_union:
+        pairs.append(('union', CongestionAnalyzer(geometry_calculator, mode='union'),
+                      CongestionAnalyzer(geometry_calculator, mode='clip', exact_union=True)))
+    rois = [RegionOfInterest(item['cordinate']) for item in load_roi_data()]
+    rois = [roi for roi in rois if roi.is_convex]
+
+    failed = False
+    print(f"{'overlap':>7} {'segments':>8} {'raster ms':>10} {'clip ms':>8} {'mean |diff| pp':>15} {'max |diff| pp':>14}")
+    for name, raster, clip in pairs:
+        for count in args.segments:
+            raster_ms = clip_ms = 0.0
+            diffs = []
+            for index, roi in enumerate(rois):
+                segments = synthetic_segments(roi.points, count, image_size, seed=index)
+                raster_ms += time_call(lambda: raster.calculate_congestion(segments, roi, image_size),
+                                       args.iterations)
+                clip_ms += time_call(lambda: clip.calculate_congestion(segments, roi, image_size),
+                                     args.iterations)
+                diffs.append(abs(raster.calculate_congestion(segments, roi, image_size) -
+                                 clip.calculate_congestion(segments, roi, image_size)))
+            diffs = np.array(diffs)
+            failed = failed or diffs.max() > args.tolerance
+            print(f"{name:>7} {count:>8} {raster_ms / len(rois):>10.3f} {clip_ms / len(rois):>8.3f} "
+                  f"{diffs.mean():>15.3f} {diffs.max():>14.3f}")
+
+    if failed:
+        print(f"FAIL: clip mode differs from raster mode by more than {args.tolerance} pp")
+        sys.exit(1)
+    print(f"OK: clip mode within {args.tolerance} pp of raster mode on {len(rois)} ROIs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import glob
+import json
+import time
+import zlib
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Tuple
+
+def load_roi_data(path: str = 'camera_coordinates.json') -> List[Dict]:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def synthetic_segments(roi: List[Tuple[int, int]], count: int,
+                       image_size: Tuple[int, int] = (800, 800),
+                       seed: int = 0) -> List[np.ndarray]:
+    """Random vehicle-like polygons (ellipses) scattered around the ROI"""
+    rng = np.random.default_rng(seed)
+    roi = np.array(roi, dtype=np.float32)
+    low, high = roi.min(axis=0) - 20, roi.max(axis=0) + 20
+    angles = np.linspace(0, 2 * np.pi, 24, endpoint=False)
+    segments = []
+    for _ in range(count):
+        center = rng.uniform(low, high)
+        radius = rng.uniform(8, 45, size=2)
+        points = np.stack([center[0] + radius[0] * np.cos(angles),
+                           center[1] + radius[1] * np.sin(angles)], axis=1)
+        points = np.clip(points, 0, [image_size[1] - 1, image_size[0] - 1])
+        segments.append(points.astype(np.int32))
+    return segments
+
+def time_samples(func: Callable, iterations: int) -> List[float]:
+    """Return the wall time of each of iterations calls of func() in milliseconds, after one warm-up call"""
+    func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def time_call(func: Callable, iterations: int) -> float:
+    """Return the mean wall time of func() in milliseconds"""
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+class StubResult:
+    """Stands in for an Ultralytics result with no detections"""
+    masks = None
+
+def stub_predict_batch(infer_ms_per_frame: float = 0.0) -> Callable[[List[np.ndarray]], List[StubResult]]:
+    """Build a predict_batch replacement that sleeps to simulate model latency"""
+    def predict_batch(frames: List[np.ndarray]) -> List[StubResult]:
+        if infer_ms_per_frame:
+            time.sleep(infer_ms_per_frame * len(frames) / 1000)
+        return [StubResult() for _ in frames]
+    return predict_batch
+
+class LocalImageFetcher:
+    """Stands in for ImageFetcher, serving <camID>_latest.jpg URLs from local image files.
+
+    Every camera is mapped to one of the images by a stable hash of its ID.
+    Images are always decoded again, so repeated fetches are never ImageNotModified.
+    """
+    def __init__(self, image_pattern: str = 'data/*.jpg'):
+        self.images = []
+        for path in sorted(glob.glob(image_pattern)):
+            with open(path, 'rb') as f:
+                self.images.append(f.read())
+        if not self.images:
+            raise SystemExit(f"No images matched {image_pattern}")
+
+    def image_bytes(self, camera_id: str) -> bytes:
+        return self.images[zlib.crc32(camera_id.encode()) % len(self.images)]
+
+    def fetch(self, url: str, conditional: bool = True) -> np.ndarray:
+        camera_id = url.rsplit('/', 1)[-1].split('_')[0]
+        image = cv2.imdecode(np.frombuffer(self.image_bytes(camera_id), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise Exception("Failed to decode image")
+        return image
+
+    def invalidate(self, url: str):
+        pass
+
+class SyntheticMasks:
+    """Ultralytics-like masks: polygons in xy, instance rasters in data at the frame resolution"""
+    def __init__(self, segments: List[np.ndarray], shape: Tuple[int, int]):
+        self.xy = [segment.astype(np.float32) for segment in segments]
+        self._shape = shape
+
+    @property
+    def data(self) -> np.ndarray:
+        data = np.zeros((len(self.xy),) + self._shape, dtype=np.uint8)
+        for index, segment in enumerate(self.xy):
+            cv2.fillPoly(data[index], [segment.astype(np.int32)], 1)
+        return data
+
+    def __len__(self) -> int:
+        return len(self.xy)
+
+class SyntheticBoxes:
+    """Ultralytics-like boxes of the synthetic segments: all cars, decreasing confidence"""
+    def __init__(self, segments: List[np.ndarray]):
+        self.cls = np.full(len(segments), 2, dtype=np.float32)
+        self.conf = np.linspace(0.9, 0.3, len(segments), dtype=np.float32)
+        self.xywh = np.array([[*segment.mean(axis=0), *np.ptp(segment, axis=0)] for segment in segments],
+                             dtype=np.float32).reshape((-1, 4))
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+class SyntheticResult:
+    """Stands in for an Ultralytics result with vehicle-like detections"""
+    names = {2: 'car'}
+
+    def __init__(self, segments: List[np.ndarray], shape: Tuple[int, int]):
+        self.orig_shape = shape
+        self.masks = SyntheticMasks(segments, shape) if segments else None
+        self.boxes = SyntheticBoxes(segments)
+
+class SyntheticModel:
+    """Callable in place of an Ultralytics YOLO model, for benchmarks without weights.
+
+    Returns seeded random ellipses over each frame, the same ones for the same
+    frame content, after sleeping infer_ms per frame to simulate the model.
+    """
+    def __init__(self, vehicles: int = 20, infer_ms: float = 0.0):
+        self.vehicles = vehicles
+        self.infer_ms = infer_ms
+
+    def __call__(self, frames, **kwargs) -> List[SyntheticResult]:
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        if self.infer_ms:
+            time.sleep(self.infer_ms * len(frames) / 1000)
+        results = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            seed = zlib.crc32(np.ascontiguousarray(frame[::16, ::16]).tobytes())
+            segments = synthetic_segments([(0, 0), (width, 0), (width, height), (0, height)],
+                                          self.vehicles, (height, width), seed=seed)
+            results.append(SyntheticResult(segments, (height, width)))
+        return results
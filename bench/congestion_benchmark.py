@@ -0,0 +1,51 @@
+import argparse
+from bench.common import load_roi_data, synthetic_segments, time_call
+from utils.geometry import GeometryCalculator
+from services.congestion_analyzer import CongestionAnalyzer
+
+def legacy_congestion(geometry_calculator, segments, roi, image_size):
+    # The per-segment full-frame path used before the single-raster engine
+    roi_area = geometry_calculator.calculate_polygon_area(roi)
+    total_area = 0
+    for segment in segments:
+        total_area += geometry_calculator.calculate_intersection_area(segment, roi, image_size)
+    return min((total_area / roi_area) * 100 if roi_area > 0 else 0, 100)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and single-raster congestion paths")
+    parser.add_argument('--segments', type=int, nargs='+', default=[5, 20, 60, 120])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--size', type=int, default=800)
+    args = parser.parse_args()
+
+    image_size = (args.size, args.size)
+    geometry_calculator = GeometryCalculator()
+    union_analyzer = CongestionAnalyzer(geometry_calculator, mode='union')
+    sum_analyzer = CongestionAnalyzer(geometry_calculator, mode='sum')
+    roi_data = load_roi_data()
+
+    print(f"{'segments':>8} {'legacy ms':>10} {'sum ms':>8} {'union ms':>9} {'speedup':>8} "
+          f"{'legacy %':>9} {'sum %':>7} {'union %':>8}")
+    for count in args.segments:
+        legacy_ms = sum_ms = union_ms = 0.0
+        legacy_pct = sum_pct = union_pct = 0.0
+        for index, item in enumerate(roi_data):
+            roi = [tuple(coord) for coord in item['cordinate']]
+            segments = synthetic_segments(roi, count, image_size, seed=index)
+            legacy_ms += time_call(lambda: legacy_congestion(
+                geometry_calculator, segments, roi, image_size), args.iterations)
+            sum_ms += time_call(lambda: sum_analyzer.calculate_congestion(
+                segments, roi, image_size), args.iterations)
+            union_ms += time_call(lambda: union_analyzer.calculate_congestion(
+                segments, roi, image_size), args.iterations)
+            legacy_pct += legacy_congestion(geometry_calculator, segments, roi, image_size)
+            sum_pct += sum_analyzer.calculate_congestion(segments, roi, image_size)
+            union_pct += union_analyzer.calculate_congestion(segments, roi, image_size)
+
+        cameras = len(roi_data)
+        print(f"{count:>8} {legacy_ms / cameras:>10.3f} {sum_ms / cameras:>8.3f} "
+              f"{union_ms / cameras:>9.3f} {legacy_ms / union_ms:>7.1f}x "
+              f"{legacy_pct / cameras:>9.2f} {sum_pct / cameras:>7.2f} {union_pct / cameras:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from services.history_store import HistoryStore
+
+def fill(store: HistoryStore, connection, cameras: int, days: float, interval: float, end: float) -> int:
+    """Write synthetic samples in batches the way the store's writer thread does"""
+    rng = random.Random(0)
+    count = 0
+    timestamp = end - days * 86400
+    batch = []
+    while timestamp < end:
+        for camera in range(cameras):
+            batch.append((f'cam{camera:03d}', timestamp, rng.uniform(0, 100), rng.randint(0, 40), rng.uniform(0.1, 2)))
+        if len(batch) >= store.batch_size:
+            store._write(connection, batch)
+            count += len(batch)
+            batch = []
+        timestamp += interval
+    if batch:
+        store._write(connection, batch)
+        count += len(batch)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="History store write throughput and history query latency")
+    parser.add_argument('--cameras', type=int, default=5)
+    parser.add_argument('--days', type=float, default=90)
+    parser.add_argument('--interval', type=float, default=15.0, help="seconds between samples per camera")
+    parser.add_argument('--raw-retention-days', type=float, default=7)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='history_benchmark_'), 'history.db')
+    store = HistoryStore(path, raw_retention=args.raw_retention_days * 86400)
+    connection = store._connect()
+    end = time.time()
+    start = time.perf_counter()
+    count = fill(store, connection, args.cameras, args.days, args.interval, end)
+    elapsed = time.perf_counter() - start
+    print(f"wrote {count} samples in {elapsed:.1f} s ({count / elapsed:.0f} samples/s), "
+          f"database {os.path.getsize(path) / 1e6:.1f} MB")
+
+    print(f"{'range':>8} {'step':>7} {'points':>7} {'ms':>8}")
+    for days, step in [(1, 60), (1, 15), (7, 900), (30, 3600), (args.days, 3600), (args.days, 86400)]:
+        start = time.perf_counter()
+        points = store.history('cam000', end - days * 86400, end, step)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{days:>7g}d {step:>6}s {len(points):>7} {elapsed:>8.1f}")
+    connection.close()
+    store.close()
+
+if __name__ == "__main__":
+    main()
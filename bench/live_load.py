@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import resource
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import numpy as np
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.closed = 0
+        self.events = 0
+        self.heartbeats = 0
+        self.connect_ms: List[float] = []
+        # event id -> receive times over all reading subscribers
+        self.received: Dict[int, List[float]] = {}
+
+async def subscribe(host: str, port: int, path: str, stats: Stats, stalled: bool):
+    """One SSE client over a raw HTTP/1.0 connection, so the body arrives unchunked; runs until cancelled"""
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        status = await reader.readline()
+        if b' 200 ' not in status:
+            raise ConnectionError(status.decode(errors='replace').strip())
+        while (await reader.readline()).strip():
+            pass
+    except (OSError, ConnectionError) as e:
+        stats.failed += 1
+        if stats.failed <= 5:
+            print(f"Subscriber failed: {e}")
+        return
+    stats.connected += 1
+    stats.connect_ms.append((time.perf_counter() - start) * 1000)
+    try:
+        if stalled:
+            # Never reads: the server has to absorb it without slowing anyone else
+            await asyncio.Event().wait()
+        while True:
+            line = await reader.readline()
+            if not line:
+                stats.closed += 1
+                return
+            if line.startswith(b'id: '):
+                stats.events += 1
+                stats.received.setdefault(int(line[4:]), []).append(time.perf_counter())
+            elif line.startswith(b':'):
+                stats.heartbeats += 1
+    finally:
+        writer.close()
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+async def run(args):
+    url = urlsplit(args.url)
+    path = '/cameras/events' + (f'?ids={args.ids}' if args.ids else '')
+    stats = Stats()
+    tasks = []
+    for index in range(args.subscribers):
+        stalled = index < args.stalled
+        tasks.append(asyncio.ensure_future(
+            subscribe(url.hostname, url.port or 80, path, stats, stalled)))
+        if (index + 1) % args.connect_batch == 0:
+            await asyncio.sleep(0.05)
+    print(f"Opening {args.subscribers} subscribers ({args.stalled} stalled) to {args.url}{path}")
+    await asyncio.sleep(args.duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    readers = max(stats.connected - args.stalled, 1)
+    # Fan-out lag: first to last reading subscriber receiving the same event
+    spread = [(max(times) - min(times)) * 1000 for times in stats.received.values() if len(times) > 1]
+    complete = sum(len(times) >= readers for times in stats.received.values())
+    print(f"connected {stats.connected}, failed {stats.failed}, closed by server {stats.closed}")
+    print(f"connect ms: p50 {percentile(stats.connect_ms, 50)}, p95 {percentile(stats.connect_ms, 95)}")
+    print(f"events received {stats.events} ({stats.events / args.duration:.1f}/s), "
+          f"distinct {len(stats.received)}, reaching every reader {complete}, heartbeats {stats.heartbeats}")
+    print(f"fan-out spread ms: p50 {percentile(spread, 50)}, p95 {percentile(spread, 95)}, "
+          f"max {percentile(spread, 100)}")
+
+def main_load():
+    parser = argparse.ArgumentParser(
+        description="Load test of the /cameras/events live updates against a running API")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--stalled', type=int, default=0, help="subscribers that connect but never read")
+    parser.add_argument('--ids', help="comma-separated camera IDs to subscribe to, default all")
+    parser.add_argument('--duration', type=float, default=60, help="seconds to listen")
+    parser.add_argument('--connect-batch', type=int, default=100, help="connections opened per 50 ms")
+    args = parser.parse_args()
+
+    # Each subscriber is a socket: lift the soft open-files limit as far as allowed
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < args.subscribers + 64:
+        limit = hard if hard == resource.RLIM_INFINITY else min(hard, args.subscribers + 64)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main_load()
@@ -0,0 +1,70 @@
+import argparse
+import glob
+import time
+import cv2
+import numpy as np
+from bench.common import load_roi_data
+from main import extract_segments
+from models.yolo_model import YOLOModel
+from utils.geometry import GeometryCalculator, RegionOfInterest
+from services.congestion_analyzer import CongestionAnalyzer
+from visualization.renderer import TrafficVisualizer
+
+def polygon_path(analyzer, frame, result, roi):
+    segments = extract_segments(result)
+    congestion = analyzer.calculate_congestion(segments, roi, frame.shape[:2])
+    TrafficVisualizer.draw_results(frame, roi.points, segments, congestion)
+    return congestion
+
+def mask_path(analyzer, frame, result, roi):
+    union_mask = YOLOModel.union_mask(result)
+    congestion = analyzer.calculate_mask_congestion(union_mask, roi)
+    TrafficVisualizer.draw_results(frame, roi.points, [], congestion, union_mask)
+    return congestion
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-frame post-inference latency and congestion agreement: polygon vs mask-native path")
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--weights', default=YOLOModel.model_name)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--rois', type=int, default=5, help="camera ROIs applied to each image")
+    args = parser.parse_args()
+
+    YOLOModel.model_name = args.weights
+    yolo_model = YOLOModel()
+    frames = [cv2.imread(path) for path in sorted(glob.glob(args.images))]
+    if not frames:
+        raise SystemExit(f"No images matched {args.images}")
+    rois = [RegionOfInterest(item['cordinate']) for item in load_roi_data()][:args.rois]
+    analyzer = CongestionAnalyzer(GeometryCalculator())
+
+    timings = {'polygon': [], 'mask': []}
+    diffs = []
+    detections = 0
+    samples = 0
+    for _ in range(args.iterations):
+        for frame in frames:
+            for roi in rois:
+                values = {}
+                for name, path in (('polygon', polygon_path), ('mask', mask_path)):
+                    # Fresh results for each path: Ultralytics caches masks.xy after the first access
+                    result = yolo_model.predict_batch([frame], conf=args.conf, verbose=False)[0]
+                    detections += 0 if result.masks is None else len(result.masks.data)
+                    start = time.perf_counter()
+                    values[name] = path(analyzer, frame, result, roi)
+                    timings[name].append((time.perf_counter() - start) * 1000)
+                diffs.append(abs(values['polygon'] - values['mask']))
+                samples += 1
+
+    print(f"{len(frames)} images x {len(rois)} ROIs x {args.iterations} iterations, "
+          f"{detections / (2 * samples):.1f} detections/frame")
+    print(f"{'path':<8} {'mean ms/frame':>14} {'p95 ms/frame':>13}")
+    for name, values in timings.items():
+        print(f"{name:<8} {np.mean(values):>14.3f} {np.percentile(values, 95):>13.3f}")
+    diffs = np.array(diffs)
+    print(f"congestion |polygon - mask|: mean {diffs.mean():.3f} pp, max {diffs.max():.3f} pp")
+
+if __name__ == "__main__":
+    main()
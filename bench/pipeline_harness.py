@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import glob
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bench.common import load_roi_data, stub_predict_batch
+from services.image_fetcher import ImageFetcher, ImageNotModified
+from services.camera_registry import CameraRegistry
+from services.worker_pool import WorkerPool
+import main
+
+class FakeCameraHandler(BaseHTTPRequestHandler):
+    """Serves /temp_images/<camID>_latest.jpg from the bundled sample images"""
+    images = []
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        camera_id = self.path.rsplit('/', 1)[-1].split('_')[0]
+        index = hash(camera_id) % len(self.images)
+        body, etag = self.images[index], f'"{index}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fake_camera_server(image_pattern: str, latency_ms: float) -> ThreadingHTTPServer:
+    images = []
+    for path in sorted(glob.glob(image_pattern)):
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    if not images:
+        raise SystemExit(f"No images matched {image_pattern}")
+    handler = type('Handler', (FakeCameraHandler,), {'images': images, 'latency': latency_ms / 1000})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def fake_registry(count: int) -> CameraRegistry:
+    # Reuse the real ROIs under synthetic camera IDs
+    roi_data = load_roi_data()
+    return CameraRegistry.from_data(
+        [{'camID': f'fake{i:05d}', 'cordinate': roi_data[i % len(roi_data)]['cordinate']}
+         for i in range(count)])
+
+async def measure_cycle(pipeline, registry: CameraRegistry):
+    """Run one refresh cycle off the event loop and record the worst event-loop stall"""
+    camera_ids = registry.camera_ids()
+    max_stall = 0.0
+    done = False
+
+    async def probe():
+        nonlocal max_stall
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_stall = max(max_stall, time.perf_counter() - start - 0.01)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    outcomes = await asyncio.to_thread(main.process_cameras, camera_ids, registry, pipeline=pipeline)
+    elapsed = time.perf_counter() - start
+    done = True
+    await probe_task
+    unchanged = sum(isinstance(outcome, ImageNotModified) for outcome in outcomes.values())
+    errors = sum(isinstance(outcome, Exception) for outcome in outcomes.values()) - unchanged
+    return elapsed, errors, unchanged, max_stall
+
+def main_harness():
+    parser = argparse.ArgumentParser(description="Measure refresh cycle time against a local fake camera server")
+    parser.add_argument('--cameras', type=int, nargs='+', default=[50, 100, 250, 500])
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="simulated camera server latency")
+    parser.add_argument('--model', choices=['stub', 'yolo'], default='stub')
+    parser.add_argument('--infer-ms', type=float, default=20.0, help="stub model latency per frame")
+    parser.add_argument('--fetch-workers', type=int, default=8)
+    parser.add_argument('--postprocess-workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--queue-size', type=int, default=32)
+    parser.add_argument('--inference-processes', type=int, default=0,
+                        help="run YOLO and post-processing in a worker pool of this many inference processes")
+    parser.add_argument('--postprocess-processes', type=int, default=4)
+    parser.add_argument('--cycles', type=int, default=2,
+                        help="refresh cycles per camera count; later cycles hit the unchanged-image path")
+    args = parser.parse_args()
+    if args.inference_processes and args.model == 'stub':
+        parser.error("--inference-processes needs --model yolo; the stub model cannot run in a worker process")
+
+    server = start_fake_camera_server(args.images, args.latency_ms)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/temp_images/'
+    output_dir = tempfile.mkdtemp(prefix='pipeline_harness_')
+
+    print(f"{'cameras':>8} {'cycle':>6} {'cycle s':>8} {'cameras/s':>10} {'unchanged':>10} "
+          f"{'errors':>7} {'max loop stall ms':>18}")
+    for count in args.cameras:
+        main.image_fetcher = ImageFetcher(pool_size=args.fetch_workers)
+        worker_pool = None
+        if args.inference_processes:
+            worker_pool = WorkerPool(args.inference_processes, args.postprocess_processes,
+                                     batch_size=args.batch_size, mode=main.CONGESTION_MODE,
+                                     exact_union=main.CONGESTION_EXACT_UNION)
+        pipeline = main.create_pipeline(
+            fetch_workers=args.fetch_workers, postprocess_workers=args.postprocess_workers,
+            batch_size=args.batch_size, queue_size=args.queue_size,
+            base_url=base_url, output_dir=output_dir, worker_pool=worker_pool)
+        if args.model == 'stub':
+            pipeline.predict_batch = stub_predict_batch(args.infer_ms)
+        registry = fake_registry(count)
+        for cycle in range(1, args.cycles + 1):
+            elapsed, errors, unchanged, max_stall = asyncio.run(measure_cycle(pipeline, registry))
+            print(f"{count:>8} {cycle:>6} {elapsed:>8.2f} {count / elapsed:>10.1f} {unchanged:>10} "
+                  f"{errors:>7} {max_stall * 1000:>18.1f}")
+        if worker_pool is not None:
+            worker_pool.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main_harness()
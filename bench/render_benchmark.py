@@ -0,0 +1,66 @@
+import argparse
+import glob
+import cv2
+import numpy as np
+from bench.common import load_roi_data, synthetic_segments, time_call
+from visualization.renderer import TrafficVisualizer
+
+def legacy_draw_results(frame, roi_coordinates, processed_segments, congestion_percentage):
+    # The renderer before ROI-cropped blending: full copy, per-segment drawing, full-frame blend
+    overlay = frame.copy()
+    primary_color = (118, 205, 48)
+    secondary_color = (190, 235, 189)
+    text_color = (189, 255, 247)
+    cv2.polylines(overlay, [np.array(roi_coordinates, dtype=np.int32)], True, secondary_color, 2)
+    for segment in processed_segments:
+        cv2.polylines(overlay, [segment], True, primary_color, 2)
+        cv2.fillPoly(overlay, [segment], primary_color, 50)
+    result = cv2.addWeighted(overlay, 0.5, frame, 0.5, 0)
+    cv2.putText(result, f"{congestion_percentage:.2f}%", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, text_color, 2)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame rendering and encoding cost, legacy vs current renderer")
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--segments', type=int, default=30)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--quality', type=int, nargs='+', default=[90, 75])
+    parser.add_argument('--widths', type=int, nargs='+', default=[0, 256])
+    args = parser.parse_args()
+
+    frames = [cv2.imread(path) for path in sorted(glob.glob(args.images))]
+    if not frames:
+        raise SystemExit(f"No images matched {args.images}")
+    rois = [[tuple(coord) for coord in item['cordinate']] for item in load_roi_data()]
+
+    timings = {'legacy draw': [], 'draw (alloc)': [], 'draw (buffers)': []}
+    encode = {(quality, width): [] for quality in args.quality for width in args.widths}
+    sizes = {key: [] for key in encode}
+    for index, frame in enumerate(frames):
+        for roi_index, roi in enumerate(rois):
+            segments = synthetic_segments(roi, args.segments, frame.shape[:2], seed=index * 100 + roi_index)
+            buffers = TrafficVisualizer.get_buffers(f'bench{roi_index}', frame.shape)
+            timings['legacy draw'].append(time_call(
+                lambda: legacy_draw_results(frame, roi, segments, 42.0), args.iterations))
+            timings['draw (alloc)'].append(time_call(
+                lambda: TrafficVisualizer.draw_results(frame, roi, segments, 42.0), args.iterations))
+            timings['draw (buffers)'].append(time_call(
+                lambda: TrafficVisualizer.draw_results(frame, roi, segments, 42.0, buffers=buffers),
+                args.iterations))
+            result = TrafficVisualizer.draw_results(frame, roi, segments, 42.0)
+            for quality, width in encode:
+                encode[(quality, width)].append(time_call(
+                    lambda: TrafficVisualizer.encode_jpeg(result, quality, width or None), args.iterations))
+                sizes[(quality, width)].append(len(TrafficVisualizer.encode_jpeg(result, quality, width or None)))
+
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} images ({width}x{height}) x {len(rois)} ROIs, {args.segments} segments each")
+    print(f"{'step':<28} {'mean ms':>8}")
+    for name, values in timings.items():
+        print(f"{name:<28} {np.mean(values):>8.3f}")
+    for (quality, max_width), values in encode.items():
+        label = f"encode q{quality} " + (f"w{max_width}" if max_width else "full")
+        print(f"{label:<28} {np.mean(values):>8.3f}   {np.mean(sizes[(quality, max_width)]) / 1024:.1f} KiB")
+
+if __name__ == "__main__":
+    main()
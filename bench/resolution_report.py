@@ -0,0 +1,67 @@
+import argparse
+import glob
+import cv2
+import numpy as np
+from bench.common import load_roi_data, synthetic_segments, time_call
+from utils.geometry import GeometryCalculator, RegionOfInterest
+from services.congestion_analyzer import CongestionAnalyzer
+
+def load_segments(frames, model: str):
+    """Segments per frame from YOLO, or synthetic vehicles when the model is unavailable"""
+    if model == 'yolo':
+        try:
+            from models.yolo_model import YOLOModel
+            from main import extract_segments
+            yolo_model = YOLOModel()
+            return [extract_segments(result)
+                    for result in yolo_model.predict_batch(frames, verbose=False)], 'yolo'
+        except Exception as e:
+            print(f"YOLO unavailable ({e}), falling back to synthetic segments")
+    return None, 'synthetic'
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Accuracy and latency of the congestion raster at different analysis resolutions")
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.33, 0.25])
+    parser.add_argument('--model', choices=['yolo', 'synthetic'], default='yolo')
+    parser.add_argument('--segments', type=int, default=40, help="vehicles per frame in synthetic mode")
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.images))
+    frames = [cv2.imread(path) for path in paths]
+    if not frames:
+        raise SystemExit(f"No images matched {args.images}")
+    segments_per_frame, source = load_segments(frames, args.model)
+    # The sample images have no ROI of their own, so every camera ROI is applied to each image
+    rois = [RegionOfInterest(item['cordinate']) for item in load_roi_data()]
+    analyzer = CongestionAnalyzer(GeometryCalculator())
+
+    rows = {'legacy 800x800': [], **{f'scale {scale:g}': [] for scale in args.scales}}
+    for frame_index, frame in enumerate(frames):
+        image_size = frame.shape[:2]
+        for roi_index, roi in enumerate(rois):
+            if segments_per_frame is None:
+                segments = synthetic_segments(roi.points, args.segments, image_size,
+                                              seed=frame_index * len(rois) + roi_index)
+            else:
+                segments = segments_per_frame[frame_index]
+            reference = analyzer.calculate_congestion(segments, roi, image_size)
+            cases = [('legacy 800x800', (800, 800), 1.0)]
+            cases += [(f'scale {scale:g}', image_size, scale) for scale in args.scales]
+            for name, size, scale in cases:
+                value = analyzer.calculate_congestion(segments, roi, size, scale=scale)
+                ms = time_call(lambda: analyzer.calculate_congestion(segments, roi, size, scale=scale),
+                               args.iterations)
+                rows[name].append((ms, abs(value - reference)))
+
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} images ({width}x{height}), {len(rois)} ROIs each, {source} segments")
+    print(f"{'resolution':<16} {'mean ms':>8} {'mean |err| pp':>14} {'max |err| pp':>13}")
+    for name, values in rows.items():
+        values = np.array(values)
+        print(f"{name:<16} {values[:, 0].mean():>8.3f} {values[:, 1].mean():>14.3f} {values[:, 1].max():>13.3f}")
+
+if __name__ == "__main__":
+    main()
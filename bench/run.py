@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+import cv2
+import numpy as np
+from bench.common import (LocalImageFetcher, SyntheticModel, load_roi_data, synthetic_segments,
+                          time_samples)
+from models.yolo_model import YOLOModel
+from services.camera_registry import CameraRegistry
+from services.congestion_analyzer import CongestionAnalyzer
+from utils.geometry import GeometryCalculator, RegionOfInterest
+from visualization.renderer import RenderBuffers, TrafficVisualizer
+import main
+
+def summarize(samples: List[float]) -> Dict:
+    samples = np.asarray(samples)
+    return {
+        "calls": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 4),
+        "median_ms": round(float(np.median(samples)), 4),
+        "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        "min_ms": round(float(samples.min()), 4),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def use_model(model: str, vehicles: int, infer_ms: float) -> str:
+    """Install the YOLOModel singleton: real weights when available, else the synthetic model"""
+    if model == 'auto':
+        model = YOLOModel.model_name if os.path.exists(YOLOModel.model_name) else 'stub'
+    if model == 'stub':
+        instance = object.__new__(YOLOModel)
+        instance.model = SyntheticModel(vehicles, infer_ms)
+        YOLOModel._instance = instance
+        return 'stub'
+    YOLOModel.model_name = os.path.abspath(model)
+    YOLOModel._instance = None
+    YOLOModel()
+    return model
+
+def build_cameras(count: int, fetcher: LocalImageFetcher) -> List[Dict]:
+    """count cameras cycling over the real ROIs, each with its sample image, frame and detections"""
+    roi_data = load_roi_data()
+    cameras = []
+    for index in range(count):
+        item = roi_data[index % len(roi_data)]
+        camera_id = item['camID'] if index < len(roi_data) else f"{item['camID']}-{index}"
+        encoded = fetcher.image_bytes(camera_id)
+        frame = cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_COLOR)
+        roi = RegionOfInterest([tuple(coord) for coord in item['cordinate']])
+        cameras.append({
+            "camera_id": camera_id,
+            "item": {**item, 'camID': camera_id},
+            "encoded": encoded,
+            "frame": frame,
+            "roi": roi,
+            "segments": synthetic_segments(roi.points, 20, frame.shape[:2], seed=index),
+        })
+    return cameras
+
+def run_stage(cameras: List[Dict], iterations: int, make_call: Callable[[Dict], Callable]) -> Dict:
+    samples = []
+    for camera in cameras:
+        samples += time_samples(make_call(camera), iterations)
+    return summarize(samples)
+
+def union_mask(camera: Dict) -> np.ndarray:
+    mask = np.zeros(camera["frame"].shape[:2], dtype=np.uint8)
+    for segment in camera["segments"]:
+        cv2.fillPoly(mask, [segment], 1)
+    return mask
+
+def render_call(camera: Dict) -> Callable:
+    buffers = RenderBuffers(camera["frame"].shape)
+    return lambda: TrafficVisualizer.draw_results(
+        camera["frame"], camera["roi"].points, camera["segments"], 42.0, buffers=buffers)
+
+def run_suite(args) -> Dict:
+    fetcher = LocalImageFetcher(args.images)
+    model = use_model(args.model, args.vehicles, args.infer_ms)
+    cameras = build_cameras(args.cameras, fetcher)
+    geometry_calculator = GeometryCalculator()
+    analyzers = {mode: CongestionAnalyzer(geometry_calculator, mode=mode) for mode in CongestionAnalyzer.MODES}
+    for camera in cameras:
+        camera["union_mask"] = union_mask(camera)
+
+    stages = {
+        "decode": lambda camera: lambda: cv2.imdecode(
+            np.frombuffer(camera["encoded"], dtype=np.uint8), cv2.IMREAD_COLOR),
+        "encode": lambda camera: lambda: TrafficVisualizer.encode_jpeg(camera["frame"], 90),
+        "geometry_covered_area": lambda camera: lambda: geometry_calculator.calculate_covered_area(
+            camera["segments"], camera["roi"], camera["frame"].shape[:2]),
+        "geometry_polygon_areas": lambda camera: lambda: [
+            geometry_calculator.calculate_polygon_area(segment) for segment in camera["segments"]],
+        "congestion_union": lambda camera: lambda: analyzers['union'].calculate_congestion(
+            camera["segments"], camera["roi"], camera["frame"].shape[:2]),
+        "congestion_sum": lambda camera: lambda: analyzers['sum'].calculate_congestion(
+            camera["segments"], camera["roi"], camera["frame"].shape[:2]),
+        "congestion_clip": lambda camera: lambda: analyzers['clip'].calculate_congestion(
+            camera["segments"], camera["roi"], camera["frame"].shape[:2]),
+        "congestion_mask": lambda camera: lambda: analyzers['mask'].calculate_mask_congestion(
+            camera["union_mask"], camera["roi"]),
+        "render": render_call,
+        "inference": lambda camera: lambda: YOLOModel().predict(camera["frame"]),
+    }
+    results = {}
+    for name, make_call in stages.items():
+        results[name] = run_stage(cameras, args.iterations, make_call)
+        print(f"{name:>24} {results[name]['median_ms']:>10.3f} ms median {results[name]['p95_ms']:>10.3f} ms p95")
+
+    # The full process_camera path and a pipeline cycle, without network; images are written to a temp dir
+    main.image_fetcher = fetcher
+    registry = CameraRegistry.from_data([camera["item"] for camera in cameras])
+    output_dir = tempfile.mkdtemp(prefix='bench_run_')
+    cwd = os.getcwd()
+    os.makedirs(os.path.join(output_dir, 'result'))
+    os.chdir(output_dir)
+    try:
+        results["process_camera"] = run_stage(
+            cameras, args.iterations, lambda camera: lambda: main.process_camera(camera["camera_id"], registry))
+        pipeline = main.create_pipeline(batch_size=args.batch_size, output_dir='result')
+        cycle = summarize(time_samples(
+            lambda: main.process_cameras(registry.camera_ids(), registry, pipeline=pipeline), args.iterations))
+        cycle["cameras_per_second"] = round(len(cameras) * 1000 / cycle["median_ms"], 1)
+        results["pipeline_cycle"] = cycle
+    finally:
+        os.chdir(cwd)
+    for name in ("process_camera", "pipeline_cycle"):
+        print(f"{name:>24} {results[name]['median_ms']:>10.3f} ms median {results[name]['p95_ms']:>10.3f} ms p95")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "model": model,
+            "cameras": len(cameras),
+            "iterations": args.iterations,
+            "vehicles": args.vehicles,
+            "congestion_mode": main.CONGESTION_MODE,
+        },
+        "results": results,
+    }
+
+def compare(report: Dict, baseline_path: str, tolerance: float) -> bool:
+    """Print median changes against a baseline report; False if any stage got slower than tolerance"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit')})")
+    print(f"{'stage':>24} {'baseline ms':>12} {'current ms':>11} {'change':>8}")
+    ok = True
+    for name, result in report["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        change = result["median_ms"] / previous["median_ms"] - 1 if previous["median_ms"] else 0
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"{name:>24} {previous['median_ms']:>12.3f} {result['median_ms']:>11.3f} "
+              f"{change * 100:>+7.1f}%{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main_suite():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite over the bundled sample images")
+    parser.add_argument('--cameras', type=int, default=20, help="cameras, cycling over camera_coordinates.json")
+    parser.add_argument('--iterations', type=int, default=20, help="timed calls per camera and stage")
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--model', default='auto',
+                        help="auto (weights if present, else stub), stub, or a YOLO weights file")
+    parser.add_argument('--vehicles', type=int, default=20, help="detections per frame of the stub model")
+    parser.add_argument('--infer-ms', type=float, default=0.0, help="simulated stub model latency per frame")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--output', help="JSON results file (default: bench/results/<commit>.json)")
+    parser.add_argument('--compare', help="baseline JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed median slowdown per stage before --compare fails, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    output = args.output or os.path.join('bench', 'results', f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare and not compare(report, args.compare, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_suite()
@@ -1,28 +1,43 @@
 import cv2
 import numpy as np
-import requests
 from models.yolo_model import YOLOModel
-from utils.geometry import GeometryCalculator
+from utils.geometry import GeometryCalculator, RegionOfInterest
 from services.congestion_analyzer import CongestionAnalyzer
 from visualization.renderer import TrafficVisualizer
-import json
+from visualization.render_cache import RenderCache
+from services.pipeline import AnalysisResult, CameraPipeline
+from services.image_fetcher import ImageFetcher, ImageNotModified
+from services.camera_registry import CameraInfo, CameraRegistry
+from services.motion_gate import MotionGate
+from services.worker_pool import WorkerPool
+from services.metrics import time_stage
 from urllib.parse import urlparse
 import os
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
-def load_image_from_url(url):
-    # Download image from URL
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception(f"Failed to download image: {response.status_code}")
-    
-    # Convert to numpy array
-    image_array = np.asarray(bytearray(response.content), dtype=np.uint8)
-    # Decode the image
-    image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-    if image is None:
-        raise Exception("Failed to decode image")
-    return image
+CAMERA_BASE_URL = os.environ.get(
+    'CAMERA_BASE_URL', 'https://traffic-camera-api-868447533878.asia-southeast1.run.app/temp_images/')
+# Default congestion raster scale for cameras without their own analysis_scale
+ANALYSIS_SCALE = float(os.environ.get('ANALYSIS_SCALE', 1.0))
+# Congestion engine: union / sum (raster), clip (analytic polygon clipping)
+# or mask (the model's raster masks, no polygons)
+CONGESTION_MODE = os.environ.get('CONGESTION_MODE', 'union')
+CONGESTION_EXACT_UNION = os.environ.get('CONGESTION_EXACT_UNION', '0') == '1'
+# Vehicle counting in the ROI (centroid or overlap) and the confidence-filtered congestion
+VEHICLE_COUNT_MODE = os.environ.get('VEHICLE_COUNT_MODE', 'centroid')
+VEHICLE_MIN_OVERLAP = float(os.environ.get('VEHICLE_MIN_OVERLAP', 0.5))
+CONGESTION_MIN_CONFIDENCE = float(os.environ.get('CONGESTION_MIN_CONFIDENCE', 0.5))
+
+image_fetcher = ImageFetcher()
+# Skips inference when a camera's ROI barely changed; MOTION_THRESHOLD=0 disables it
+motion_gate = MotionGate(
+    threshold=float(os.environ.get('MOTION_THRESHOLD', 0)),
+    max_staleness=float(os.environ.get('MOTION_MAX_STALENESS', 120)))
+
+def load_image_from_url(url, conditional: bool = True):
+    # Download and decode the image over the pooled session; raises
+    # ImageNotModified when the camera has not refreshed since the last fetch
+    return image_fetcher.fetch(url, conditional=conditional)
 
 def get_camera_id_from_url(url):
     # Extract camera ID from URL
@@ -32,79 +47,227 @@ def get_camera_id_from_url(url):
     camera_id = filename.split('_')[0]
     return camera_id
 
-def get_roi_coordinates_for_camera(roi_data, camera_id):
-    # Find the ROI coordinates for the specific camera
-    for item in roi_data:
-        if item['camID'] == camera_id:
-            # Convert the coordinates to the format expected by the geometry calculator
-            return [tuple(coord) for coord in item['cordinate']]
-    return None
+def get_camera(registry: CameraRegistry, camera_id: str) -> CameraInfo:
+    # Look up the camera and its cached ROI
+    camera = registry.get(camera_id)
+    if camera is None:
+        raise Exception(f"No ROI coordinates found for camera {camera_id}")
+    return camera
 
-def process_camera(camera_id: str, roi_data) -> Tuple[str, float]:
-    """Process a single camera and return the result path and congestion percentage"""
-    base_url = 'https://traffic-camera-api-868447533878.asia-southeast1.run.app/temp_images/'
-    image_url = base_url + camera_id + '_latest.jpg'
+def get_analysis_scale(camera: CameraInfo) -> float:
+    return float(camera.analysis_scale) if camera.analysis_scale else ANALYSIS_SCALE
+
+def extract_segments(result) -> List[np.ndarray]:
+    # Convert YOLO mask polygons to int32 point arrays
+    return YOLOModel.segments(result)
+
+def get_congestion_analyzer() -> CongestionAnalyzer:
+    return CongestionAnalyzer(
+        GeometryCalculator(), mode=CONGESTION_MODE, exact_union=CONGESTION_EXACT_UNION,
+        count_mode=VEHICLE_COUNT_MODE, min_overlap=VEHICLE_MIN_OVERLAP,
+        min_confidence=CONGESTION_MIN_CONFIDENCE)
+
+# Fail on import rather than on every frame when the congestion settings are invalid
+# (unknown modes, or CONGESTION_EXACT_UNION=1 without shapely)
+get_congestion_analyzer()
+
+def measure_congestion(frame: np.ndarray, result, roi: RegionOfInterest,
+                       analysis_scale: float = 1.0) -> Tuple[float, List[np.ndarray], Optional[np.ndarray]]:
+    """Congestion percentage of one predicted frame, with the segments and union mask used to draw it"""
+    congestion_percentage, processed_segments, union_mask, _ = measure_frame(
+        frame, result, roi, analysis_scale, occupancy=False)
+    return congestion_percentage, processed_segments, union_mask
+
+def measure_frame(frame: np.ndarray, result, roi: RegionOfInterest, analysis_scale: float = 1.0,
+                  occupancy: bool = True) -> Tuple[float, List[np.ndarray], Optional[np.ndarray], Dict]:
+    """measure_congestion plus, with occupancy, the per-class occupancy of the frame"""
+    analyzer = get_congestion_analyzer()
+    # One instance map serves the mask mode union and the occupancy
+    instance_map = YOLOModel.instance_map(result) if occupancy or CONGESTION_MODE == 'mask' else None
+    if CONGESTION_MODE == 'mask':
+        # Use the model's raster masks directly, no polygon round-trip
+        processed_segments = []
+        union_mask = (instance_map > 0).astype(np.uint8) if instance_map is not None else None
+    else:
+        processed_segments, union_mask = extract_segments(result), None
+    # Rasterize at the real frame resolution, optionally downscaled
+    with time_stage('geometry'):
+        congestion_percentage = analyzer.measure(
+            processed_segments, union_mask, roi, frame.shape[:2], scale=analysis_scale)
+        stats = {}
+        if occupancy:
+            stats["occupancy"] = analyzer.calculate_occupancy(
+                instance_map, *YOLOModel.detections(result), getattr(result, 'names', {}), roi)
+    return congestion_percentage, processed_segments, union_mask, stats
+
+def analyze_frame(camera_id: str, frame: np.ndarray, result,
+                  roi: RegionOfInterest, output_dir: str = 'result',
+                  analysis_scale: float = 1.0) -> AnalysisResult:
+    """Run geometry and rendering for one predicted frame and return the result path and congestion percentage"""
+    congestion_percentage, processed_segments, union_mask, stats = measure_frame(
+        frame, result, roi, analysis_scale)
     
-    # Get ROI coordinates for this camera
-    roi_coordinates = get_roi_coordinates_for_camera(roi_data, camera_id)
+    # Draw into the camera's reusable scratch buffers and save the result
+    output_path = os.path.join(output_dir, f'{camera_id}.jpg')
+    buffers = TrafficVisualizer.get_buffers(camera_id, frame.shape)
+    with buffers.lock:
+        with time_stage('render'):
+            result_frame = TrafficVisualizer.draw_results(
+                frame, roi.points, processed_segments, congestion_percentage, union_mask, buffers)
+        with time_stage('imwrite'):
+            cv2.imwrite(output_path, result_frame)
     
-    if roi_coordinates is None:
-        raise Exception(f"No ROI coordinates found for camera {camera_id}")
+    return AnalysisResult(output_path, congestion_percentage, YOLOModel.count(result), **stats)
+
+def analyze_frame_lazy(camera_id: str, frame: np.ndarray, result, roi: RegionOfInterest,
+                       render_cache: RenderCache, analysis_scale: float = 1.0) -> AnalysisResult:
+    """Analyze one predicted frame and leave rendering to the render cache; no file is written"""
+    congestion_percentage, processed_segments, union_mask, stats = measure_frame(
+        frame, result, roi, analysis_scale)
+    render_cache.store(camera_id, frame, roi.points, processed_segments, union_mask,
+                       congestion_percentage)
+    return AnalysisResult(None, congestion_percentage, YOLOModel.count(result), **stats)
+
+def get_image_url(camera_id: str, base_url: str = CAMERA_BASE_URL) -> str:
+    return base_url + camera_id + '_latest.jpg'
+
+def invalidate_camera(camera_id: str, base_url: str = CAMERA_BASE_URL):
+    # Make the next fetch of this camera download and analyze the image again
+    image_fetcher.invalidate(get_image_url(camera_id, base_url))
+
+def process_camera(camera_id: str, registry: CameraRegistry) -> Tuple[str, float]:
+    """Process a single camera and return the result path and congestion percentage"""
+    image_url = get_image_url(camera_id)
+    
+    # Get ROI for this camera
+    camera = get_camera(registry, camera_id)
     
     # Load the image from URL
     frame = load_image_from_url(image_url)
     
-    # Initialize components
-    image_size = (800, 800)
-    
-    # Initialize services
-    yolo_model = YOLOModel()
-    geometry_calculator = GeometryCalculator()
-    congestion_analyzer = CongestionAnalyzer(geometry_calculator)
+    # Reuse the previous result if the ROI has not changed enough
+    reused = motion_gate.check(camera_id, frame, camera)
+    if reused is not None:
+        return reused
     
     # Get YOLO predictions
-    results = yolo_model.predict(frame)
-    segments = results[0].masks.xy if results[0].masks else []
-    
-    processed_segments = [np.array(segment, dtype=np.int32) for segment in segments]
-    
-    congestion_percentage = congestion_analyzer.calculate_congestion(
-        processed_segments, roi_coordinates, image_size)
-    
-    result_frame = TrafficVisualizer.draw_results(
-        frame, roi_coordinates, processed_segments, congestion_percentage)
-    
-    # Save result
-    output_path = f'result/{camera_id}.jpg'
-    cv2.imwrite(output_path, result_frame)
-    
-    return output_path, congestion_percentage
+    try:
+        yolo_model = YOLOModel()
+        with time_stage('inference'):
+            results = yolo_model.predict(frame)
+        outcome = analyze_frame(camera_id, frame, results[0], camera.roi,
+                                analysis_scale=get_analysis_scale(camera))
+    except Exception as e:
+        motion_gate.record(camera_id, e)
+        raise
+    motion_gate.record(camera_id, outcome)
+    return outcome
+
+def create_pipeline(fetch_workers: int = 8, postprocess_workers: int = 4,
+                    batch_size: int = 8, queue_size: int = 32,
+                    base_url: str = CAMERA_BASE_URL, output_dir: str = 'result',
+                    render_cache: Optional[RenderCache] = None,
+                    worker_pool: Optional[WorkerPool] = None) -> CameraPipeline:
+    """Wire the camera fetch, batched YOLO inference and analysis steps into a CameraPipeline.
+
+    With a render_cache, result images are rendered on demand instead of
+    being written to output_dir every cycle. With a worker_pool, inference
+    and post-processing run in its processes and the pipeline gets one
+    thread per worker process instead of postprocess_workers threads.
+    """
+    if worker_pool is not None:
+        return CameraPipeline(
+            fetch=lambda camera_id: load_image_from_url(get_image_url(camera_id, base_url)),
+            predict_batch=worker_pool.predict_batch,
+            analyze=lambda camera_id, frame, detections, camera: worker_pool.analyze(
+                camera_id, frame, detections, camera.roi.points, get_analysis_scale(camera),
+                output_dir, render_cache),
+            fetch_workers=fetch_workers,
+            postprocess_workers=worker_pool.postprocess_workers,
+            batch_size=worker_pool.batch_size,
+            queue_size=queue_size,
+            gate=motion_gate,
+            infer_workers=worker_pool.inference_workers)
+    if render_cache is not None:
+        analyze = lambda camera_id, frame, result, camera: analyze_frame_lazy(
+            camera_id, frame, result, camera.roi, render_cache, get_analysis_scale(camera))
+    else:
+        analyze = lambda camera_id, frame, result, camera: analyze_frame(
+            camera_id, frame, result, camera.roi, output_dir, get_analysis_scale(camera))
+    return CameraPipeline(
+        fetch=lambda camera_id: load_image_from_url(get_image_url(camera_id, base_url)),
+        predict_batch=lambda frames: YOLOModel().predict_batch(frames, batch_size=batch_size),
+        analyze=analyze,
+        fetch_workers=fetch_workers,
+        postprocess_workers=postprocess_workers,
+        batch_size=batch_size,
+        queue_size=queue_size,
+        gate=motion_gate)
+
+def create_worker_pool(batch_size: int = 8) -> Optional[WorkerPool]:
+    """Worker processes configured by WORKER_INFERENCE_PROCESSES and WORKER_POSTPROCESS_PROCESSES.
+
+    Returns None when WORKER_INFERENCE_PROCESSES is 0 (the default), i.e.
+    everything runs in threads of the current process.
+    """
+    inference_workers = int(os.environ.get('WORKER_INFERENCE_PROCESSES', 0))
+    if inference_workers < 1:
+        return None
+    return WorkerPool(
+        inference_workers=inference_workers,
+        postprocess_workers=int(os.environ.get('WORKER_POSTPROCESS_PROCESSES', 4)),
+        inference_threads=int(os.environ.get('WORKER_TORCH_THREADS', 0)),
+        batch_size=batch_size,
+        mode=CONGESTION_MODE,
+        exact_union=CONGESTION_EXACT_UNION,
+        count_mode=VEHICLE_COUNT_MODE,
+        min_overlap=VEHICLE_MIN_OVERLAP,
+        min_confidence=CONGESTION_MIN_CONFIDENCE)
 
-def main(roi_data):
+def process_cameras(camera_ids: List[str], registry: CameraRegistry, batch_size: int = 8,
+                    pipeline: Optional[CameraPipeline] = None,
+                    on_result=None) -> Dict[str, Union[Tuple[str, float], Exception]]:
+    """Process several cameras through the staged pipeline with batched inference.
+
+    Returns a mapping of camera ID to (result path, congestion percentage),
+    or to the exception raised for that camera.
+    """
+    pipeline = pipeline or create_pipeline(batch_size=batch_size)
+    outcomes: Dict[str, Union[Tuple[str, float], Exception]] = {}
+    jobs = []
+    for camera_id in camera_ids:
+        try:
+            jobs.append((camera_id, get_camera(registry, camera_id)))
+        except Exception as e:
+            outcomes[camera_id] = e
+
+    outcomes.update(pipeline.run(jobs, on_result))
+    return outcomes
+
+def main(registry: CameraRegistry, batch_size: int = 8):
     # Create result directory if it doesn't exist
     os.makedirs('result', exist_ok=True)
     
-    # Process all cameras from roi_data
-    for camera_data in roi_data:
-        camera_id = camera_data['camID']
-        try:
-            output_path, congestion = process_camera(camera_id, roi_data)
-            print(f"\nProcessing Camera ID: {camera_id}")
-            print(f"Results saved to {output_path}")
-            print(f"Congestion percentage: {congestion:.2f}%")
-        except Exception as e:
-            print(f"Error processing camera {camera_id}: {e}")
+    # Process all cameras from the registry
+    camera_ids = registry.camera_ids()
+    outcomes = process_cameras(camera_ids, registry, batch_size=batch_size)
+    for camera_id in camera_ids:
+        outcome = outcomes[camera_id]
+        if isinstance(outcome, ImageNotModified):
+            print(f"\nCamera {camera_id} unchanged since last fetch")
             continue
+        if isinstance(outcome, Exception):
+            print(f"Error processing camera {camera_id}: {outcome}")
+            continue
+        output_path, congestion = outcome
+        print(f"\nProcessing Camera ID: {camera_id}")
+        print(f"Results saved to {output_path}")
+        print(f"Congestion percentage: {congestion:.2f}%")
 
 if __name__ == "__main__":
-    # Load ROI coordinates from JSON file
-    try:
-        with open('camera_coordinates.json', 'r') as f:
-            roi_data = json.load(f)
-            if not roi_data:
-                print("Warning: No camera coordinates found in camera_coordinates.json")
-    except FileNotFoundError:
-        print("Error: camera_coordinates.json not found")
-        roi_data = []
+    # Load ROI coordinates and camera metadata
+    registry = CameraRegistry('camera_coordinates.json', 'cam.json')
+    if not len(registry):
+        print("Warning: No camera coordinates found in camera_coordinates.json")
     
-    main(roi_data) 
\ No newline at end of file
+    main(registry) 
\ No newline at end of file
@@ -1,20 +1,233 @@
-from ultralytics import YOLO
-from typing import Optional
+import glob
+import os
+import shutil
+import tempfile
+from functools import partial
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+# Export precision -> ultralytics quantize argument
+PRECISIONS = {'fp32': 32, 'fp16': 16, 'int8': 8}
 
 class YOLOModel:
     _instance = None  # Singleton pattern
+    _lock = Lock()
+    # An ultralytics predictor is not thread-safe: concurrent refresh batches
+    # (SCHEDULER_MAX_IN_FLIGHT) each run an infer thread, so calls take turns
+    _predict_lock = Lock()
     model_name = 'pretrained_models/traffic_detect_model.pt'
+    # onnx and openvino run a CPU export of model_name, created next to it on first use.
+    # Read from the environment here so that spawned worker processes pick them up too
+    backend = os.environ.get('YOLO_BACKEND', 'torch')
+    precision = os.environ.get('YOLO_PRECISION', 'fp32')
+    threads = int(os.environ.get('YOLO_THREADS', 0))
+    calibration_data = os.environ.get('YOLO_CALIBRATION_DATA') or None
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(YOLOModel, cls).__new__(cls)
-        return cls._instance
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(YOLOModel, cls).__new__(cls)
+            return cls._instance
 
     def __init__(self):
-        if not hasattr(self, 'model'):
+        if hasattr(self, 'model'):
+            return
+        # Concurrent first calls (warm-up thread, refresh cycle) wait for a single load
+        with self._lock:
+            if hasattr(self, 'model'):
+                return
             try:
-                self.model = YOLO(self.model_name)
+                # Imported here so that importing this module does not pull in torch
+                from ultralytics import YOLO
+                self.weights = self.weights_path()
+                model = YOLO(self.weights, task='segment')
+                self._set_threads(model)
+                self.model = model
             except Exception as e:
                 raise Exception(f"Error loading YOLO model: {e}")
 
+    @classmethod
+    def weights_path(cls) -> str:
+        """Model file of the configured backend, exporting model_name to it when missing or older"""
+        if cls.backend not in BACKENDS:
+            raise ValueError(f"Unknown YOLO backend {cls.backend!r}, expected one of {BACKENDS}")
+        if cls.precision not in PRECISIONS:
+            raise ValueError(f"Unknown YOLO precision {cls.precision!r}, expected one of {tuple(PRECISIONS)}")
+        if cls.backend == 'torch':
+            return cls.model_name
+        stem = os.path.splitext(cls.model_name)[0]
+        path = f"{stem}_{cls.precision}" + ('.onnx' if cls.backend == 'onnx' else '_openvino_model')
+        # A deployment may ship only the export, without the checkpoint
+        if not os.path.exists(path) or (os.path.exists(cls.model_name) and
+                                        os.path.getmtime(path) < os.path.getmtime(cls.model_name)):
+            cls.export(path)
+        return path
+
+    @classmethod
+    def export(cls, path: str):
+        """Export model_name for the configured backend and precision to path.
+
+        The export runs on a copy in a temporary directory and is moved into
+        place at the end, so processes loading the model concurrently never
+        see a partial export. Shapes are dynamic, so batches and rectangular
+        letterboxing work as with the PyTorch model.
+        """
+        from ultralytics import YOLO
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(path) or '.') as directory:
+            source = shutil.copy(cls.model_name, directory)
+            exported = YOLO(source, task='segment').export(
+                format=cls.backend, dynamic=True, quantize=PRECISIONS[cls.precision],
+                data=cls.calibration_data, device='cpu')
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.replace(exported, path)
+            except OSError:
+                # Another process finished the same export first
+                if not os.path.exists(path):
+                    raise
+
+    def _set_threads(self, model):
+        """Limit the intra-op threads of the inference runtime to threads (0 keeps its default)"""
+        if self.threads <= 0:
+            return
+        if self.backend == 'torch':
+            import torch
+            torch.set_num_threads(self.threads)
+            return
+        # Ultralytics creates the runtime session with the predictor on the first call, without
+        # a thread setting, so the session is replaced by one with the same model
+        model.predict(np.zeros((32, 32, 3), dtype=np.uint8), verbose=False)
+        runtime = model.predictor.model.backend
+        if self.backend == 'onnx':
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            runtime.session = onnxruntime.InferenceSession(
+                self.weights, options, providers=['CPUExecutionProvider'])
+        else:
+            import openvino
+            core = openvino.Core()
+            config = {'PERFORMANCE_HINT': 'LATENCY', 'INFERENCE_NUM_THREADS': self.threads}
+            runtime.compile_model = partial(core.compile_model, device_name='CPU', config=config)
+            runtime.ov_compiled_model = runtime.compile_model(
+                core.read_model(glob.glob(os.path.join(self.weights, '*.xml'))[0]))
+
+    @classmethod
+    def loaded(cls) -> bool:
+        return cls._instance is not None and hasattr(cls._instance, 'model')
+
+    def warm_up(self, shape: Tuple[int, int, int] = (288, 512, 3), batch_size: int = 1):
+        """Run a dummy batch at the expected frame shape so the first real batch is not slowed by lazy setup"""
+        frames = [np.zeros(shape, dtype=np.uint8) for _ in range(batch_size)]
+        self.predict_batch(frames, batch_size=batch_size, verbose=False)
+
     def predict(self, frame):
-        return self.model(frame) 
\ No newline at end of file
+        with self._predict_lock:
+            return self.model(frame)
+
+    def predict_batch(self, frames: List[np.ndarray], batch_size: int = 8, **kwargs) -> List:
+        """Run frames through the model in batches and return one result per frame, in input order.
+
+        Frames are grouped by shape first so each batch is letterboxed with
+        minimal padding instead of being padded to a common square.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for index, frame in enumerate(frames):
+            groups.setdefault(frame.shape, []).append(index)
+
+        results: List[Optional[object]] = [None] * len(frames)
+        for indices in groups.values():
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                with self._predict_lock:
+                    batch_results = self.model([frames[i] for i in chunk], **kwargs)
+                for index, result in zip(chunk, batch_results):
+                    results[index] = result
+        return results
+
+    @staticmethod
+    def count(result) -> int:
+        """Number of detections in a result"""
+        boxes = getattr(result, 'boxes', None)
+        return len(boxes) if boxes is not None else 0
+
+    @staticmethod
+    def segments(result) -> List[np.ndarray]:
+        """A result's mask polygons as int32 point arrays in original frame coordinates"""
+        segments = result.masks.xy if result.masks else []
+        return [np.array(segment, dtype=np.int32) for segment in segments]
+
+    @staticmethod
+    def detections(result) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(class ids, confidences, box centers in frame coordinates) of a result's detections"""
+        boxes = getattr(result, 'boxes', None)
+        if boxes is None or len(boxes) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32), np.zeros((0, 2), dtype=np.float32)
+        return (YOLOModel._to_numpy(boxes.cls).astype(np.int32),
+                YOLOModel._to_numpy(boxes.conf).astype(np.float32),
+                YOLOModel._to_numpy(boxes.xywh)[:, :2].astype(np.float32))
+
+    @staticmethod
+    def union_mask(result) -> Optional[np.ndarray]:
+        """OR of a result's instance masks, mapped back to the original frame as a uint8 0/1 mask.
+
+        Uses the model's raster masks (masks.data) directly instead of
+        polygonizing them with masks.xy. Returns None when nothing was detected.
+        """
+        if result.masks is None:
+            return None
+        data = YOLOModel._to_numpy(result.masks.data)
+        # max over the instance axis is much cheaper than a boolean any() on torch
+        union = (data.max(axis=0) > 0.5).astype(np.uint8)
+        return YOLOModel._to_frame(union, result.orig_shape)
+
+    @staticmethod
+    def instance_map(result) -> Optional[np.ndarray]:
+        """Frame-sized uint16 map of which detection covers each pixel: 1 + its index, 0 for background.
+
+        Where masks overlap the most confident detection wins. Built from the
+        raster masks (masks.data) in one vectorized pass over all instances;
+        instance_map > 0 is the union mask. Returns None when nothing was detected.
+        """
+        if result.masks is None:
+            return None
+        data = YOLOModel._to_numpy(result.masks.data)
+        _, confidences, _ = YOLOModel.detections(result)
+        count = len(data)
+        order = np.argsort(confidences, kind='stable') if len(confidences) == count else np.arange(count)
+        # Weight every instance's mask by its confidence rank (1 = least confident) and
+        # take the max over the instance axis, the same reduction as union_mask
+        ranks = np.empty(count, dtype=np.uint8 if count < 256 else np.uint16)
+        ranks[order] = np.arange(1, count + 1)
+        # Recent ultralytics versions already return binary uint8 masks
+        binary = data if data.dtype == np.uint8 else (data > 0.5).astype(np.uint8)
+        weighted = binary * ranks[:, None, None]
+        instance_ids = np.zeros(count + 1, dtype=np.uint16)
+        instance_ids[ranks] = np.arange(1, count + 1)
+        return YOLOModel._to_frame(instance_ids[weighted.max(axis=0)], result.orig_shape)
+
+    @staticmethod
+    def _to_numpy(data) -> np.ndarray:
+        return data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+
+    @staticmethod
+    def _to_frame(mask: np.ndarray, orig_shape: Tuple[int, ...]) -> np.ndarray:
+        # masks.data lives in the letterboxed inference shape: crop the padding and resize
+        height, width = orig_shape[:2]
+        mask_height, mask_width = mask.shape
+        if (mask_height, mask_width) == (height, width):
+            return mask
+        gain = min(mask_height / height, mask_width / width)
+        pad_x = (mask_width - round(width * gain)) / 2
+        pad_y = (mask_height - round(height * gain)) / 2
+        top, left = round(pad_y - 0.1), round(pad_x - 0.1)
+        bottom, right = top + round(height * gain), left + round(width * gain)
+        return cv2.resize(mask[top:bottom, left:right], (width, height),
+                          interpolation=cv2.INTER_NEAREST)
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+import cv2
+from models.yolo_model import YOLOModel
+from services.camera_registry import CameraRegistry
+from main import get_analysis_scale, measure_frame
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+FIELDS = ["camera_id", "timestamp", "file", "congestion", "confident_congestion", "vehicles_in_roi",
+          "vehicles", "detections", "error"]
+
+# (camera_id, file name, path) of one archived snapshot
+ArchiveFile = Tuple[str, str, str]
+
+class Checkpoint:
+    """Last archive file whose row is safely in the output, and the output size at that point.
+
+    Files are visited in a fixed order (camera directories, then file names,
+    both sorted), so one position marks everything before it as done. The
+    file is replaced atomically; rows written after the last save are cut
+    off on resume and analyzed again.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def save(self, camera_id: str, name: str, offset: int, rows: int):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({"camera_id": camera_id, "file": name, "offset": offset, "rows": rows}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+def archive_files(root: str, registry: CameraRegistry,
+                  after: Optional[Tuple[str, str]] = None) -> Iterator[ArchiveFile]:
+    """Snapshots under root/<camID>/, lazily and in checkpoint order, starting after (camera_id, name)"""
+    for camera_id in sorted(entry.name for entry in os.scandir(root) if entry.is_dir()):
+        if after is not None and camera_id < after[0]:
+            continue
+        if registry.get(camera_id) is None:
+            print(f"Skipping {camera_id}: no ROI in camera_coordinates.json", file=sys.stderr)
+            continue
+        directory = os.path.join(root, camera_id)
+        # One directory is listed at a time, so memory follows the largest camera, not the archive
+        names = sorted(entry.name for entry in os.scandir(directory)
+                       if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names:
+            if after is not None and camera_id == after[0] and name <= after[1]:
+                continue
+            yield camera_id, name, os.path.join(directory, name)
+
+def decode_ahead(files: Iterator[ArchiveFile], workers: int, depth: int) -> Iterator[Tuple[ArchiveFile, object]]:
+    """Decode files on a thread pool, at most depth ahead, yielding (file, frame or exception) in order"""
+    def decode(path: str):
+        try:
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            return frame if frame is not None else Exception("Could not decode image")
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reanalyze-decode') as executor:
+        pending = deque()
+        for item in files:
+            pending.append((item, executor.submit(decode, item[2])))
+            if len(pending) >= depth:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+def parse_timestamp(name: str) -> str:
+    # Unix seconds or an ISO 8601 time in the file name; anything else is passed through
+    stem = os.path.splitext(name)[0]
+    try:
+        return datetime.fromtimestamp(float(stem)).isoformat()
+    except (ValueError, OverflowError, OSError):
+        pass
+    try:
+        return datetime.fromisoformat(stem).isoformat()
+    except ValueError:
+        return stem
+
+def analyze_batch(batch: List[Tuple[ArchiveFile, object]], registry: CameraRegistry,
+                  batch_size: int) -> List[Dict]:
+    """One CSV row per file; decode and analysis errors are reported in the row"""
+    decoded = [index for index, (_, frame) in enumerate(batch) if not isinstance(frame, Exception)]
+    results = dict(zip(decoded, YOLOModel().predict_batch(
+        [batch[index][1] for index in decoded], batch_size=batch_size, verbose=False))) if decoded else {}
+    rows = []
+    for index, ((camera_id, name, _), frame) in enumerate(batch):
+        row = {"camera_id": camera_id, "timestamp": parse_timestamp(name), "file": f"{camera_id}/{name}"}
+        if isinstance(frame, Exception):
+            rows.append({**row, "error": str(frame)})
+            continue
+        result = results[index]
+        try:
+            camera = registry.get(camera_id)
+            congestion, _, _, stats = measure_frame(frame, result, camera.roi, get_analysis_scale(camera))
+            occupancy = stats["occupancy"]
+            rows.append({
+                **row,
+                "congestion": round(congestion, 2),
+                "confident_congestion": round(occupancy["confident_congestion"], 2),
+                "vehicles_in_roi": occupancy["vehicles_in_roi"],
+                "vehicles": json.dumps(occupancy["vehicles"], ensure_ascii=False),
+                "detections": YOLOModel.count(result),
+            })
+        except Exception as e:
+            rows.append({**row, "error": str(e)})
+    return rows
+
+def chunks(items: Iterator, size: int) -> Iterator[List]:
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-analyze an archive of snapshots laid out as <camID>/<timestamp>.jpg into a CSV")
+    parser.add_argument('archive', help="directory with one subdirectory per camera ID")
+    parser.add_argument('--output', default='reanalysis.csv')
+    parser.add_argument('--checkpoint', help="progress file (default: <output>.checkpoint)")
+    parser.add_argument('--restart', action='store_true', help="discard existing output and progress")
+    parser.add_argument('--batch-size', type=int, default=8, help="frames per inference call")
+    parser.add_argument('--decode-workers', type=int, default=4)
+    parser.add_argument('--checkpoint-every', type=int, default=500, help="files between checkpoints")
+    parser.add_argument('--limit', type=int, help="stop after this many files (for trial runs)")
+    args = parser.parse_args()
+
+    registry = CameraRegistry('camera_coordinates.json', 'cam.json')
+    checkpoint = Checkpoint(args.checkpoint or args.output + '.checkpoint')
+    if args.restart and os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)
+    state = checkpoint.load()
+    if state is None and not args.restart and os.path.exists(args.output):
+        raise SystemExit(f"{args.output} exists without a checkpoint; pass --restart to overwrite it")
+
+    output = open(args.output, 'a+' if state else 'w', newline='', encoding='utf-8')
+    try:
+        if state:
+            # Rows after the last checkpoint are analyzed again, so cut them off first
+            output.truncate(state["offset"])
+            output.seek(state["offset"])
+            print(f"Resuming after {state['camera_id']}/{state['file']} ({state['rows']} rows done)")
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        if not state:
+            writer.writeheader()
+        rows_done = state["rows"] if state else 0
+        files = archive_files(args.archive, registry, (state["camera_id"], state["file"]) if state else None)
+        if args.limit is not None:
+            files = islice(files, args.limit)
+        decoded = decode_ahead(files, args.decode_workers, depth=args.batch_size * 2 + args.decode_workers)
+
+        YOLOModel()
+        start, processed, since_checkpoint, position = time.perf_counter(), 0, 0, None
+        for batch in chunks(decoded, args.batch_size):
+            writer.writerows(analyze_batch(batch, registry, args.batch_size))
+            processed += len(batch)
+            since_checkpoint += len(batch)
+            position = batch[-1][0][:2]
+            if since_checkpoint >= args.checkpoint_every:
+                output.flush()
+                os.fsync(output.fileno())
+                checkpoint.save(*position, output.tell(), rows_done + processed)
+                since_checkpoint = 0
+                print(f"{rows_done + processed} files, {processed / (time.perf_counter() - start):.1f} files/s, "
+                      f"at {'/'.join(position)}")
+        output.flush()
+        os.fsync(output.fileno())
+        if position is not None:
+            checkpoint.save(*position, output.tell(), rows_done + processed)
+        print(f"Done: {processed} files this run, {rows_done + processed} in {args.output}")
+    finally:
+        output.close()
+
+if __name__ == "__main__":
+    main()
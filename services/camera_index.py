@@ -0,0 +1,103 @@
+import bisect
+import math
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+def haversine_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    half_chord = (math.sin((phi2 - phi1) / 2) ** 2 +
+                  math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(half_chord), 1.0))
+
+class CameraIndex:
+    """Spatial grid and congestion order over the cached cameras, updated on every cache write.
+
+    The grid buckets cameras into cell_size-degree cells (0.01 is about 1.1 km),
+    so a bounding box or radius query only visits the cells it overlaps. The
+    congestion index is a list of (congestion, camera_id) kept sorted with
+    bisect, so a congestion threshold is a binary search.
+    Cameras without coordinates are only in the congestion index.
+    """
+    def __init__(self, cell_size: float = 0.01):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._positions: Dict[str, Tuple[float, float]] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._congestion: Dict[str, float] = {}
+        self._by_congestion: List[Tuple[float, str]] = []
+        self._lock = Lock()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def update(self, camera_id: str, latitude: Optional[float], longitude: Optional[float],
+               congestion: float):
+        with self._lock:
+            self._remove(camera_id)
+            if latitude is not None and longitude is not None:
+                self._positions[camera_id] = (latitude, longitude)
+                self._cells.setdefault(self._cell(latitude, longitude), set()).add(camera_id)
+            self._congestion[camera_id] = congestion
+            bisect.insort(self._by_congestion, (congestion, camera_id))
+
+    def remove(self, camera_id: str):
+        with self._lock:
+            self._remove(camera_id)
+
+    def _remove(self, camera_id: str):
+        position = self._positions.pop(camera_id, None)
+        if position is not None:
+            cell = self._cell(*position)
+            members = self._cells[cell]
+            members.discard(camera_id)
+            if not members:
+                del self._cells[cell]
+        congestion = self._congestion.pop(camera_id, None)
+        if congestion is not None:
+            index = bisect.bisect_left(self._by_congestion, (congestion, camera_id))
+            del self._by_congestion[index]
+
+    def in_bbox(self, min_latitude: float, min_longitude: float,
+                max_latitude: float, max_longitude: float) -> List[str]:
+        """Cameras inside the box, in no particular order"""
+        with self._lock:
+            (row0, column0), (row1, column1) = (self._cell(min_latitude, min_longitude),
+                                                self._cell(max_latitude, max_longitude))
+            cells = (row1 - row0 + 1) * (column1 - column0 + 1)
+            if cells > len(self._cells):
+                # Box larger than the populated area: scanning the populated cells is cheaper
+                candidates = [camera_id for (row, column), members in self._cells.items()
+                              if row0 <= row <= row1 and column0 <= column <= column1
+                              for camera_id in members]
+            else:
+                candidates = [camera_id for row in range(row0, row1 + 1) for column in range(column0, column1 + 1)
+                              for camera_id in self._cells.get((row, column), ())]
+            return [camera_id for camera_id in candidates
+                    if min_latitude <= self._positions[camera_id][0] <= max_latitude
+                    and min_longitude <= self._positions[camera_id][1] <= max_longitude]
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[str, float]]:
+        """(camera_id, distance in km) of the cameras within radius_km, nearest first"""
+        latitude_delta = radius_km / KM_PER_DEGREE
+        longitude_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+        candidates = self.in_bbox(latitude - latitude_delta, longitude - longitude_delta,
+                                  latitude + latitude_delta, longitude + longitude_delta)
+        with self._lock:
+            positions = [(camera_id, self._positions.get(camera_id)) for camera_id in candidates]
+        distances = [(camera_id, haversine_km(latitude, longitude, *position))
+                     for camera_id, position in positions if position is not None]
+        return sorted([item for item in distances if item[1] <= radius_km], key=lambda item: item[1])
+
+    def most_congested(self, min_congestion: Optional[float] = None) -> List[str]:
+        """Cameras by decreasing congestion, optionally only those at or above min_congestion"""
+        with self._lock:
+            start = 0 if min_congestion is None else bisect.bisect_left(
+                self._by_congestion, (min_congestion, ''))
+            return [camera_id for _, camera_id in reversed(self._by_congestion[start:])]
+
+    def __len__(self) -> int:
+        return len(self._congestion)
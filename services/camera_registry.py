@@ -0,0 +1,128 @@
+import json
+import os
+import time
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from utils.geometry import RegionOfInterest
+
+class CameraInfo:
+    def __init__(self, camera_id: str, roi: RegionOfInterest, metadata: Optional[Dict] = None,
+                 config: Optional[Dict] = None):
+        metadata = metadata or {}
+        self.camera_id = camera_id
+        self.roi = roi
+        self.url = metadata.get('url')
+        self.location = metadata.get('location')
+        self.latitude = metadata.get('latitude')
+        self.longitude = metadata.get('longitude')
+        # Raw camera_coordinates.json entry, for optional per-camera settings
+        self.config = config or {}
+        # Optional downscale factor for the congestion raster, e.g. 0.5
+        self.analysis_scale = self.config.get('analysis_scale')
+        # Optional per-camera motion gate threshold (mean gray-level change, 0-255)
+        self.motion_threshold = self.config.get('motion_threshold')
+
+class CameraRegistry:
+    """Cameras from camera_coordinates.json merged with cam.json metadata.
+
+    Lookups by camID are O(1) and each camera keeps one RegionOfInterest, so
+    its polygon, bounding box, area and per-resolution masks are computed
+    once. The files are re-read when their mtime changes, checked at most
+    every check_interval seconds.
+    """
+    def __init__(self, coordinates_path: Optional[str] = 'camera_coordinates.json',
+                 metadata_path: Optional[str] = 'cam.json', check_interval: float = 1.0):
+        self.coordinates_path = coordinates_path
+        self.metadata_path = metadata_path
+        self.check_interval = check_interval
+        self._cameras: Dict[str, CameraInfo] = {}
+        self._mtimes: Tuple[Optional[float], Optional[float]] = (None, None)
+        self._last_check = 0.0
+        self._lock = Lock()
+        self.reload_if_changed(force=True)
+
+    @classmethod
+    def from_data(cls, roi_data: List[Dict], metadata: Optional[Dict] = None) -> 'CameraRegistry':
+        """Build a registry from in-memory data instead of watched files"""
+        registry = cls(coordinates_path=None, metadata_path=None)
+        registry._load(roi_data, metadata or {})
+        return registry
+
+    @staticmethod
+    def _mtime(path: Optional[str]) -> Optional[float]:
+        try:
+            return os.path.getmtime(path) if path else None
+        except OSError:
+            return None
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Re-read the source files if their mtime changed; returns True when reloaded"""
+        if self.coordinates_path is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        with self._lock:
+            if not force and now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+            return self._reload(force)
+
+    def _reload(self, force: bool) -> bool:
+        mtimes = (self._mtime(self.coordinates_path), self._mtime(self.metadata_path))
+        if not force and mtimes == self._mtimes:
+            return False
+
+        try:
+            with open(self.coordinates_path, 'r') as f:
+                roi_data = json.load(f)
+        except FileNotFoundError:
+            print(f"Error: {self.coordinates_path} not found")
+            roi_data = []
+        except json.JSONDecodeError as e:
+            # Keep serving the previous cameras while the file is being written
+            print(f"Error reading {self.coordinates_path}: {e}")
+            return False
+
+        metadata = {}
+        if self.metadata_path and mtimes[1] is not None:
+            try:
+                with open(self.metadata_path, 'r') as f:
+                    metadata = json.load(f).get('camera_urls', {})
+            except (json.JSONDecodeError, AttributeError) as e:
+                print(f"Error reading {self.metadata_path}: {e}")
+
+        self._load(roi_data, metadata)
+        self._mtimes = mtimes
+        return True
+
+    def _load(self, roi_data: List[Dict], metadata: Dict):
+        previous = self._cameras
+        cameras = {}
+        for item in roi_data or []:
+            camera_id = item['camID']
+            points = [tuple(coord) for coord in item['cordinate']]
+            # Keep the cached ROI artifacts of cameras whose polygon did not change
+            old = previous.get(camera_id)
+            roi = old.roi if old is not None and old.roi.points == points else RegionOfInterest(points)
+            cameras[camera_id] = CameraInfo(camera_id, roi, metadata.get(camera_id), item)
+        self._cameras = cameras
+
+    def get(self, camera_id: str) -> Optional[CameraInfo]:
+        self.reload_if_changed()
+        return self._cameras.get(camera_id)
+
+    def camera_ids(self) -> List[str]:
+        self.reload_if_changed()
+        return list(self._cameras)
+
+    def all(self) -> List[CameraInfo]:
+        self.reload_if_changed()
+        return list(self._cameras.values())
+
+    def __contains__(self, camera_id: str) -> bool:
+        return self.get(camera_id) is not None
+
+    def __len__(self) -> int:
+        self.reload_if_changed()
+        return len(self._cameras)
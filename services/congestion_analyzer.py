@@ -1,20 +1,147 @@
-from typing import List, Tuple
-from utils.geometry import GeometryCalculator
+from typing import Dict, List, Optional, Tuple, Union
+from utils.geometry import GeometryCalculator, Polygon, RegionOfInterest
+import cv2
 import numpy as np
 class CongestionAnalyzer:
-    def __init__(self, geometry_calculator: GeometryCalculator):
+    # union: exact coverage of the ROI, overlapping vehicles counted once
+    # sum: legacy behaviour, per-segment overlaps are added up
+    # clip: analytic polygon clipping against a convex ROI, no image buffers;
+    #       overlaps are summed unless exact_union is set
+    # mask: exact coverage from the model's raster masks (calculate_mask_congestion);
+    #       polygon input falls back to union
+    MODES = ('union', 'sum', 'clip', 'mask')
+    # A vehicle is counted inside the ROI when its box center is (centroid)
+    # or when at least min_overlap of its visible mask is (overlap)
+    COUNT_MODES = ('centroid', 'overlap')
+    _roi_cache: Dict[Tuple[Tuple[int, int], ...], RegionOfInterest] = {}
+
+    def __init__(self, geometry_calculator: GeometryCalculator, mode: str = 'union',
+                 exact_union: bool = False, count_mode: str = 'centroid',
+                 min_overlap: float = 0.5, min_confidence: float = 0.5):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown congestion mode: {mode}")
+        if count_mode not in self.COUNT_MODES:
+            raise ValueError(f"Unknown vehicle count mode: {count_mode}")
+        if exact_union and Polygon is None:
+            raise ImportError("exact_union requires shapely (pip install shapely)")
         self.geometry_calculator = geometry_calculator
+        self.mode = mode
+        self.exact_union = exact_union
+        self.count_mode = count_mode
+        self.min_overlap = min_overlap
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def get_roi(cls, roi: Union[RegionOfInterest, List[Tuple[int, int]]]) -> RegionOfInterest:
+        if isinstance(roi, RegionOfInterest):
+            return roi
+        key = tuple(tuple(point) for point in roi)
+        region = cls._roi_cache.get(key)
+        if region is None:
+            region = cls._roi_cache[key] = RegionOfInterest(key)
+        return region
 
     def calculate_congestion(self, segments: List[np.ndarray], 
-                           roi: List[Tuple[int, int]], 
-                           image_size: Tuple[int, int]) -> float:
-        roi_area = self.geometry_calculator.calculate_polygon_area(roi)
-        total_area = 0
-
-        for segment in segments:
-            intersection_area = self.geometry_calculator.calculate_intersection_area(
-                segment, roi, image_size)
-            total_area += intersection_area
-
-        congestion_percentage = (total_area / roi_area) * 100 if roi_area > 0 else 0
-        return min(congestion_percentage, 100) 
\ No newline at end of file
+                           roi: Union[RegionOfInterest, List[Tuple[int, int]]], 
+                           image_size: Tuple[int, int], scale: float = 1.0) -> float:
+        """Percentage of the ROI covered by segments.
+
+        image_size is the (height, width) of the frame the segments come from.
+        A scale below 1 rasterizes ROI and segments at a proportionally
+        smaller resolution, trading accuracy for speed.
+        """
+        region = self.get_roi(roi)
+        if self.mode == 'clip' and region.is_convex:
+            # Resolution independent, so the analysis scale does not apply;
+            # non-convex ROIs fall through to the raster path
+            total_area = self.geometry_calculator.calculate_clipped_area(
+                segments, region, image_size, union=self.exact_union)
+            return self._to_percentage(total_area, region)
+
+        if scale != 1:
+            region = region.scaled(scale)
+            if segments:
+                # Scale all points in one array operation, then split back per segment
+                points = np.concatenate([np.asarray(segment, dtype=np.float32).reshape((-1, 2))
+                                         for segment in segments])
+                points = np.round(points * scale).astype(np.int32)
+                segments = np.split(points, np.cumsum([len(segment) for segment in segments])[:-1])
+            image_size = (max(int(round(image_size[0] * scale)), 1),
+                          max(int(round(image_size[1] * scale)), 1))
+        total_area = self.geometry_calculator.calculate_covered_area(
+            segments, region, image_size, union=self.mode != 'sum')
+        return self._to_percentage(total_area, region)
+
+    def calculate_mask_congestion(self, union_mask: Optional[np.ndarray],
+                                  roi: Union[RegionOfInterest, List[Tuple[int, int]]],
+                                  scale: float = 1.0) -> float:
+        """Percentage of the ROI covered by a frame-sized union mask of all vehicles"""
+        if union_mask is None:
+            return 0
+        region = self.get_roi(roi)
+        if scale != 1:
+            region = region.scaled(scale)
+            union_mask = cv2.resize(union_mask, None, fx=scale, fy=scale,
+                                    interpolation=cv2.INTER_NEAREST)
+        total_area = self.geometry_calculator.calculate_mask_coverage(union_mask, region)
+        return self._to_percentage(total_area, region)
+
+    def measure(self, segments: List[np.ndarray], union_mask: Optional[np.ndarray],
+                roi: Union[RegionOfInterest, List[Tuple[int, int]]],
+                image_size: Tuple[int, int], scale: float = 1.0) -> float:
+        """Congestion from the detections this mode uses: the union mask in mask mode, else the segments"""
+        if self.mode == 'mask':
+            return self.calculate_mask_congestion(union_mask, roi, scale=scale)
+        return self.calculate_congestion(segments, roi, image_size, scale=scale)
+
+    def calculate_occupancy(self, instance_map: Optional[np.ndarray], classes: np.ndarray,
+                            confidences: np.ndarray, centers: np.ndarray, names: Dict[int, str],
+                            roi: Union[RegionOfInterest, List[Tuple[int, int]]]) -> Dict:
+        """Vehicles inside the ROI per class, ROI area share per class and confidence-filtered congestion.
+
+        instance_map is YOLOModel.instance_map of the frame, classes, confidences
+        and centers are YOLOModel.detections. Every figure comes from a single
+        bincount of the instance map over the ROI pixels: a pixel belongs to its
+        most confident detection, so the class shares add up to the total
+        coverage and the pixels of detections at or above min_confidence are the
+        coverage of a frame with only those detections.
+        """
+        region = self.get_roi(roi)
+        occupancy = {"vehicles_in_roi": 0, "vehicles": {}, "area_share": {},
+                     "confident_congestion": 0.0, "min_confidence": self.min_confidence}
+        if instance_map is None or len(classes) == 0 or region.area == 0:
+            return occupancy
+        (x, y, w, h), roi_mask = region.get_mask(instance_map.shape[:2])
+        if roi_mask.size == 0:
+            return occupancy
+        count = len(classes)
+        # Pixels of each detection inside the ROI; index 0 is the background
+        inside = np.bincount(instance_map[y:y + h, x:x + w][roi_mask > 0], minlength=count + 1)[1:count + 1]
+
+        if self.count_mode == 'overlap':
+            visible = np.bincount(instance_map.ravel(), minlength=count + 1)[1:count + 1]
+            counted = (inside > 0) & (inside >= self.min_overlap * visible)
+        else:
+            column = np.floor(centers[:, 0]).astype(np.int64) - x
+            row = np.floor(centers[:, 1]).astype(np.int64) - y
+            counted = (column >= 0) & (column < w) & (row >= 0) & (row < h)
+            counted[counted] = roi_mask[row[counted], column[counted]] > 0
+
+        class_ids = np.unique(classes)
+        vehicles = np.bincount(classes[counted], minlength=class_ids.max() + 1)
+        pixels = np.bincount(classes, weights=inside, minlength=class_ids.max() + 1)
+        for class_id in class_ids:
+            name = names.get(int(class_id), str(class_id)) if names else str(class_id)
+            if vehicles[class_id]:
+                occupancy["vehicles"][name] = int(vehicles[class_id])
+            if pixels[class_id]:
+                occupancy["area_share"][name] = float(self._to_percentage(pixels[class_id], region))
+        occupancy["vehicles_in_roi"] = int(counted.sum())
+        occupancy["confident_congestion"] = float(self._to_percentage(
+            float(inside[confidences >= self.min_confidence].sum()), region))
+        return occupancy
+
+    @staticmethod
+    def _to_percentage(total_area: float, region: RegionOfInterest) -> float:
+        congestion_percentage = (total_area / region.area) * 100 if region.area > 0 else 0
+        return min(congestion_percentage, 100)
@@ -0,0 +1,16 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+
+class CongestionSmoother:
+    """Exponential moving average and rolling-window mean of a congestion series"""
+    def __init__(self, alpha: float = 0.3, window: int = 10):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.window: Deque[float] = deque(maxlen=window)
+        self.ema: Optional[float] = None
+
+    def update(self, value: float) -> Dict[str, float]:
+        self.ema = value if self.ema is None else self.alpha * value + (1 - self.alpha) * self.ema
+        self.window.append(value)
+        return {"raw": value, "ema": self.ema, "rolling_mean": sum(self.window) / len(self.window)}
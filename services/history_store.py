@@ -0,0 +1,193 @@
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Rollup resolutions in seconds: 1 minute, 15 minutes, 1 hour
+ROLLUP_RESOLUTIONS = (60, 900, 3600)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    camera_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    congestion REAL NOT NULL,
+    vehicle_count INTEGER,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS samples_camera_time ON samples (camera_id, timestamp);
+CREATE TABLE IF NOT EXISTS rollups (
+    camera_id TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    congestion_sum REAL NOT NULL,
+    congestion_min REAL NOT NULL,
+    congestion_max REAL NOT NULL,
+    vehicle_samples INTEGER NOT NULL,
+    vehicle_sum REAL NOT NULL,
+    latency_samples INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    PRIMARY KEY (camera_id, resolution, bucket)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (camera_id, resolution, bucket) DO UPDATE SET
+    samples = samples + excluded.samples,
+    congestion_sum = congestion_sum + excluded.congestion_sum,
+    congestion_min = MIN(congestion_min, excluded.congestion_min),
+    congestion_max = MAX(congestion_max, excluded.congestion_max),
+    vehicle_samples = vehicle_samples + excluded.vehicle_samples,
+    vehicle_sum = vehicle_sum + excluded.vehicle_sum,
+    latency_samples = latency_samples + excluded.latency_samples,
+    latency_sum = latency_sum + excluded.latency_sum
+"""
+
+Sample = Tuple[str, float, float, Optional[int], Optional[float]]
+
+class HistoryStore:
+    """Append-only congestion history in SQLite (WAL mode) with 1m/15m/1h rollups.
+
+    record() only enqueues; a background thread writes the queued samples in
+    one transaction every flush_interval seconds (or batch_size samples) and
+    folds them into the rollup tables at the same time. Raw samples older
+    than raw_retention seconds are pruned, the rollups are kept.
+    """
+    def __init__(self, path: str = 'history.db', flush_interval: float = 2.0,
+                 batch_size: int = 1000, max_pending: int = 100000,
+                 raw_retention: Optional[float] = 7 * 86400):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.raw_retention = raw_retention
+        self.dropped = 0
+        self._queue: 'queue.Queue[Optional[Sample]]' = queue.Queue(maxsize=max_pending)
+        self._last_prune = 0.0
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record(self, camera_id: str, timestamp: float, congestion: float,
+               vehicle_count: Optional[int] = None, latency: Optional[float] = None):
+        """Queue one sample; never blocks, samples are dropped when the writer is far behind"""
+        try:
+            self._queue.put_nowait((camera_id, timestamp, congestion, vehicle_count, latency))
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> Dict:
+        return {"pending": self._queue.qsize(), "dropped": self.dropped}
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        connection = self._connect()
+        running = True
+        while running:
+            batch: List[Sample] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    sample = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if sample is None:
+                    running = False
+                    break
+                batch.append(sample)
+            if not batch:
+                continue
+            try:
+                self._write(connection, batch)
+            except sqlite3.Error as e:
+                print(f"Error writing congestion history: {e}")
+        connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: List[Sample]):
+        # Pre-aggregate the batch so each rollup bucket is upserted once
+        rollups: Dict[Tuple[str, int, int], List[float]] = {}
+        for camera_id, timestamp, congestion, vehicle_count, latency in batch:
+            for resolution in ROLLUP_RESOLUTIONS:
+                key = (camera_id, resolution, int(timestamp // resolution) * resolution)
+                row = rollups.get(key)
+                if row is None:
+                    row = rollups[key] = [0, 0.0, congestion, congestion, 0, 0.0, 0, 0.0]
+                row[0] += 1
+                row[1] += congestion
+                row[2] = min(row[2], congestion)
+                row[3] = max(row[3], congestion)
+                if vehicle_count is not None:
+                    row[4] += 1
+                    row[5] += vehicle_count
+                if latency is not None:
+                    row[6] += 1
+                    row[7] += latency
+
+        with connection:
+            connection.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?)", batch)
+            connection.executemany(_UPSERT_ROLLUP, [key + tuple(row) for key, row in rollups.items()])
+            now = time.time()
+            if self.raw_retention and now - self._last_prune > 3600:
+                connection.execute("DELETE FROM samples WHERE timestamp < ?", (now - self.raw_retention,))
+                self._last_prune = now
+
+    def history(self, camera_id: str, start: float, end: float, step: int) -> List[Dict]:
+        """Aggregated samples of a camera in [start, end), one point per step seconds.
+
+        Steps that are a multiple of a rollup resolution are answered from the
+        coarsest such rollup; other steps read the raw samples.
+        """
+        if step < 1:
+            raise ValueError("step must be at least 1 second")
+        resolution = next((resolution for resolution in reversed(ROLLUP_RESOLUTIONS)
+                           if step % resolution == 0), None)
+        if resolution is not None:
+            query = """
+                SELECT bucket / :step * :step AS point, SUM(samples), SUM(congestion_sum),
+                       MIN(congestion_min), MAX(congestion_max), SUM(vehicle_samples),
+                       SUM(vehicle_sum), SUM(latency_samples), SUM(latency_sum)
+                FROM rollups
+                WHERE camera_id = :camera_id AND resolution = :resolution
+                      AND bucket >= :start AND bucket < :end
+                GROUP BY point ORDER BY point
+            """
+            # Buckets that start inside the range; a partial first bucket is included
+            start = int(start // resolution) * resolution
+        else:
+            query = """
+                SELECT CAST(timestamp / :step AS INTEGER) * :step AS point, COUNT(*), SUM(congestion),
+                       MIN(congestion), MAX(congestion), COUNT(vehicle_count),
+                       TOTAL(vehicle_count), COUNT(latency), TOTAL(latency)
+                FROM samples
+                WHERE camera_id = :camera_id AND timestamp >= :start AND timestamp < :end
+                GROUP BY point ORDER BY point
+            """
+        parameters = {"camera_id": camera_id, "resolution": resolution, "step": step,
+                      "start": start, "end": end}
+        connection = self._connect()
+        try:
+            rows = connection.execute(query, parameters).fetchall()
+        finally:
+            connection.close()
+        return [{
+            "timestamp": point,
+            "samples": samples,
+            "congestion": congestion_sum / samples,
+            "congestion_min": congestion_min,
+            "congestion_max": congestion_max,
+            "vehicle_count": vehicle_sum / vehicle_samples if vehicle_samples else None,
+            "latency": latency_sum / latency_samples if latency_samples else None,
+        } for (point, samples, congestion_sum, congestion_min, congestion_max,
+               vehicle_samples, vehicle_sum, latency_samples, latency_sum) in rows]
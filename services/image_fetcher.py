@@ -0,0 +1,72 @@
+import hashlib
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from services.metrics import time_stage
+
+class ImageNotModified(Exception):
+    """Raised when a camera image is unchanged since the last successful fetch"""
+
+class ImageFetcher:
+    """Pooled HTTP image fetcher with conditional requests.
+
+    Keeps one keep-alive session with retries and timeouts. For every URL it
+    remembers the ETag, Last-Modified and content hash of the last decoded
+    image, so an unchanged snapshot is detected before it is decoded.
+    """
+    def __init__(self, timeout: Tuple[float, float] = (3.05, 10),
+                 retries: int = 3, backoff_factor: float = 0.3, pool_size: int = 32):
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff_factor,
+                      status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # url -> (etag, last_modified, content digest)
+        self._validators: Dict[str, Tuple[Optional[str], Optional[str], bytes]] = {}
+        self._lock = Lock()
+
+    def fetch(self, url: str, conditional: bool = True) -> np.ndarray:
+        """Download and decode an image, raising ImageNotModified if it has not changed"""
+        with self._lock:
+            validators = self._validators.get(url)
+
+        headers = {}
+        if conditional and validators is not None:
+            etag, last_modified, _ = validators
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        with time_stage('download'):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and validators is not None:
+            raise ImageNotModified(url)
+        if response.status_code != 200:
+            raise Exception(f"Failed to download image: {response.status_code}")
+
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if conditional and validators is not None and validators[2] == digest:
+            raise ImageNotModified(url)
+
+        image_array = np.frombuffer(response.content, dtype=np.uint8)
+        with time_stage('decode'):
+            image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+        if image is None:
+            raise Exception("Failed to decode image")
+
+        with self._lock:
+            self._validators[url] = (response.headers.get('ETag'),
+                                     response.headers.get('Last-Modified'), digest)
+        return image
+
+    def invalidate(self, url: str):
+        """Forget the validators of url so the next fetch downloads and decodes it again"""
+        with self._lock:
+            self._validators.pop(url, None)
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set
+from services.metrics import LIVE_UPDATES_DROPPED
+
+def format_event(version: int, data: Dict) -> str:
+    """A Server-Sent Events frame; the cache version is the event id clients resume from"""
+    return f"id: {version}\nevent: camera\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class Subscriber:
+    """One live client: the newest pending event per camera, in arrival order.
+
+    A client that reads slower than cameras update gets their latest state
+    instead of a growing backlog; past max_pending cameras the oldest pending
+    event is dropped (the client can resync from /cameras/).
+    """
+    def __init__(self, camera_ids: Optional[Set[str]], max_pending: int):
+        self.camera_ids = camera_ids
+        self.max_pending = max_pending
+        self.pending: OrderedDict = OrderedDict()
+        self.wakeup = asyncio.Event()
+
+    def offer(self, camera_id: str, message: str):
+        if camera_id in self.pending:
+            del self.pending[camera_id]
+            LIVE_UPDATES_DROPPED.inc(reason='coalesced')
+        elif len(self.pending) >= self.max_pending:
+            self.pending.popitem(last=False)
+            LIVE_UPDATES_DROPPED.inc(reason='overflow')
+        self.pending[camera_id] = message
+        self.wakeup.set()
+
+    async def next_batch(self, timeout: float) -> List[str]:
+        """Pending events, waiting up to timeout for one; empty on timeout"""
+        if not self.pending:
+            # A timer instead of asyncio.wait_for, which costs a task per wait and
+            # on Python < 3.12 can swallow the cancellation of a disconnected client
+            self.wakeup.clear()
+            timer = asyncio.get_running_loop().call_later(timeout, self.wakeup.set)
+            try:
+                await self.wakeup.wait()
+            finally:
+                timer.cancel()
+        batch = list(self.pending.values())
+        self.pending.clear()
+        return batch
+
+class LiveUpdates:
+    """Fans cache updates out to live subscribers without ever blocking the publisher.
+
+    publish() may be called from any thread: it encodes the event once and
+    hands it to the event loop, where it is queued on every interested
+    subscriber. Subscribers with a camera filter are indexed by camera, so an
+    update only visits the clients that asked for it.
+    """
+    def __init__(self, max_pending: int = 256, max_subscribers: int = 0):
+        self.max_pending = max_pending
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self._all: Set[Subscriber] = set()
+        self._by_camera: Dict[str, Set[Subscriber]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._count = 0
+        self._lock = Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def subscribe(self, camera_ids: Optional[Iterable[str]] = None) -> Optional[Subscriber]:
+        """Register a subscriber (call on the event loop); None if max_subscribers is reached"""
+        if self.max_subscribers and self._count >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(set(camera_ids) if camera_ids is not None else None, self.max_pending)
+        if subscriber.camera_ids is None:
+            self._all.add(subscriber)
+        else:
+            for camera_id in subscriber.camera_ids:
+                self._by_camera.setdefault(camera_id, set()).add(subscriber)
+        with self._lock:
+            self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber.camera_ids is None:
+            if subscriber not in self._all:
+                return
+            self._all.discard(subscriber)
+        else:
+            removed = False
+            for camera_id in subscriber.camera_ids:
+                members = self._by_camera.get(camera_id)
+                if members is not None and subscriber in members:
+                    removed = True
+                    members.discard(subscriber)
+                    if not members:
+                        del self._by_camera[camera_id]
+            if not removed:
+                return
+        with self._lock:
+            self._count -= 1
+
+    def publish(self, camera_id: str, version: int, data: Dict):
+        if self._loop is None or not self._count:
+            return
+        message = format_event(version, data)
+        try:
+            self._loop.call_soon_threadsafe(self._fan_out, camera_id, message)
+        except RuntimeError:
+            # Event loop closed during shutdown
+            return
+        with self._lock:
+            self.published += 1
+
+    def _fan_out(self, camera_id: str, message: str):
+        for subscriber in self._all:
+            subscriber.offer(camera_id, message)
+        for subscriber in self._by_camera.get(camera_id, ()):
+            subscriber.offer(camera_id, message)
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": self._count,
+            "filtered_subscribers": self._count - len(self._all),
+            "published": self.published,
+        }
@@ -0,0 +1,187 @@
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers everything from a motion-gate check to a slow download
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+class Metric(ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines of every label set"""
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        return '\n'.join(lines + self.samples())
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in values]
+
+class Gauge(Metric):
+    """A value that goes up and down; set_function() reads it at scrape time instead"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._function: Optional[Callable[[], Dict[Tuple, float]]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], Dict[Tuple, float]]):
+        """function returns label value tuple -> value; () for a gauge without labels"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            values = list(self._function().items())
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in values]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # label values -> [per-bucket counts, sum]
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+class MetricsRegistry:
+    """Metrics rendered together in the Prometheus text exposition format"""
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+registry = MetricsRegistry()
+
+# Hot-path instrumentation shared by the fetcher, pipeline, renderer and API
+STAGE_SECONDS = registry.histogram(
+    'traffic_stage_seconds',
+    'Time spent per processing stage (download, decode, motion_gate, inference, geometry, '
+    'render, imwrite, encode, postprocess)',
+    ['stage'])
+CAMERA_SECONDS = registry.histogram(
+    'traffic_camera_seconds', 'Fetch-to-analysis latency per analyzed camera', ['camera_id'])
+REFRESH_SECONDS = registry.histogram(
+    'traffic_refresh_batch_seconds', 'Duration of one scheduler refresh batch')
+INFERENCE_BATCH_FRAMES = registry.histogram(
+    'traffic_inference_batch_frames', 'Frames per inference batch', buckets=(1, 2, 4, 8, 16, 32, 64))
+CAMERA_REFRESHES = registry.counter(
+    'traffic_camera_refreshes_total',
+    'Camera refreshes by outcome (analyzed, unchanged, skipped, error)', ['camera_id', 'outcome'])
+ERRORS = registry.counter('traffic_errors_total', 'Errors by stage', ['stage'])
+RENDER_CACHE_REQUESTS = registry.counter(
+    'traffic_render_cache_requests_total', 'Result image requests by render cache result (hit, miss)', ['result'])
+LIVE_UPDATES_DROPPED = registry.counter(
+    'traffic_live_updates_dropped_total',
+    'Live update events not delivered to a slow subscriber (coalesced, overflow)', ['reason'])
+QUEUE_DEPTH = registry.gauge('traffic_pipeline_queue_depth', 'Items waiting in pipeline stage queues', ['queue'])
+
+def time_stage(stage: str):
+    """Context manager timing one stage into STAGE_SECONDS"""
+    return STAGE_SECONDS.time(stage=stage)
@@ -0,0 +1,71 @@
+import time
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import cv2
+import numpy as np
+from services.camera_registry import CameraInfo
+
+class MotionGate:
+    """Skips inference when the ROI looks the same as in the last analyzed frame.
+
+    The ROI bounding box is cut out, converted to grayscale and shrunk to a
+    thumbnail of at most thumbnail_size pixels per side. When the mean
+    absolute difference to the thumbnail of the last inferred frame is
+    below the camera's threshold (0-255 scale), the previous result is
+    reused. It is reused for at most max_staleness seconds.
+    """
+    def __init__(self, threshold: float = 0.0, max_staleness: float = 120.0, thumbnail_size: int = 64):
+        self.threshold = threshold
+        self.max_staleness = max_staleness
+        self.thumbnail_size = thumbnail_size
+        # camera_id -> (reference thumbnail, time it was inferred, outcome)
+        self._references: Dict[str, Tuple[np.ndarray, float, Tuple[str, float]]] = {}
+        self._pending: Dict[str, np.ndarray] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = Lock()
+
+    def thumbnail(self, frame: np.ndarray, camera: CameraInfo) -> np.ndarray:
+        (x, y, w, h), _ = camera.roi.get_mask(frame.shape[:2])
+        crop = frame[y:y + h, x:x + w] if w and h else frame
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        scale = min(self.thumbnail_size / max(crop.shape[:2]), 1.0)
+        size = (max(int(crop.shape[1] * scale), 1), max(int(crop.shape[0] * scale), 1))
+        return cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+
+    def check(self, camera_id: str, frame: np.ndarray, camera: CameraInfo) -> Optional[Tuple[str, float]]:
+        """Return the previous outcome if inference can be skipped for this frame, else None"""
+        threshold = camera.motion_threshold if camera.motion_threshold is not None else self.threshold
+        thumbnail = self.thumbnail(frame, camera)
+        with self._lock:
+            counters = self._counters.setdefault(camera_id, {"inferred": 0, "skipped": 0})
+            reference = self._references.get(camera_id)
+            if (threshold > 0 and reference is not None
+                    and reference[0].shape == thumbnail.shape
+                    and time.monotonic() - reference[1] <= self.max_staleness
+                    and cv2.norm(thumbnail, reference[0], cv2.NORM_L1) / thumbnail.size < threshold):
+                counters["skipped"] += 1
+                return reference[2]
+            counters["inferred"] += 1
+            self._pending[camera_id] = thumbnail
+            return None
+
+    def record(self, camera_id: str, outcome):
+        """Make the frame passed to the last check() the new reference once it has been analyzed"""
+        with self._lock:
+            thumbnail = self._pending.pop(camera_id, None)
+            if thumbnail is None:
+                return
+            if isinstance(outcome, Exception):
+                self._references.pop(camera_id, None)
+            else:
+                self._references[camera_id] = (thumbnail, time.monotonic(), outcome)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            cameras = {camera_id: dict(counters) for camera_id, counters in self._counters.items()}
+        return {
+            "inferred": sum(counters["inferred"] for counters in cameras.values()),
+            "skipped": sum(counters["skipped"] for counters in cameras.values()),
+            "cameras": cameras,
+        }
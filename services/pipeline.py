@@ -0,0 +1,208 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from services.image_fetcher import ImageNotModified
+from services.metrics import (CAMERA_REFRESHES, CAMERA_SECONDS, ERRORS, INFERENCE_BATCH_FRAMES,
+                              QUEUE_DEPTH, time_stage)
+
+_DONE = object()  # Sentinel closing a stage queue
+
+# Stage queues of all running pipelines, reported as traffic_pipeline_queue_depth
+_active_queues: List[Tuple[str, queue.Queue]] = []
+_active_queues_lock = threading.Lock()
+
+def _queue_depths() -> Dict[Tuple[str], int]:
+    depths = {('infer',): 0, ('post',): 0}
+    with _active_queues_lock:
+        for name, stage_queue in _active_queues:
+            depths[(name,)] += stage_queue.qsize()
+    return depths
+
+QUEUE_DEPTH.set_function(_queue_depths)
+
+class AnalysisResult(tuple):
+    """(result path, congestion percentage) of one frame, unpacking like a plain pair.
+
+    The number of detected vehicles, the latency from fetch start to
+    finished analysis (seconds, set by the pipeline) and the per-class
+    occupancy (CongestionAnalyzer.calculate_occupancy) ride along as attributes.
+    """
+    def __new__(cls, output_path, congestion: float, vehicle_count: Optional[int] = None,
+                latency: Optional[float] = None, occupancy: Optional[Dict] = None):
+        result = super().__new__(cls, (output_path, congestion))
+        result.vehicle_count = vehicle_count
+        result.latency = latency
+        result.occupancy = occupancy
+        return result
+
+    def __reduce__(self):
+        return AnalysisResult, (self[0], self[1], self.vehicle_count, self.latency, self.occupancy)
+
+Outcome = Union[Tuple[str, float], Exception]
+
+class CameraPipeline:
+    """Staged fetch -> infer -> post-process pipeline over bounded queues.
+
+    Fetching and post-processing (geometry, rendering, imwrite) run in
+    thread pools of configurable size; inference runs in infer_workers
+    threads (one by default) that each batch whatever frames are ready, up
+    to batch_size. Concurrent runs share the model, whose calls are
+    serialized (see YOLOModel._predict_lock). Bounded queues between the
+    stages keep memory flat when one stage falls behind.
+
+    An optional gate (see MotionGate) is consulted after each fetch: when its
+    check() returns an outcome the camera skips inference and that outcome
+    is reported directly; analyzed outcomes are handed back via record().
+    """
+    def __init__(self,
+                 fetch: Callable[[str], np.ndarray],
+                 predict_batch: Callable[[List[np.ndarray]], List],
+                 analyze: Callable[[str, np.ndarray, object, object], Tuple[str, float]],
+                 fetch_workers: int = 8,
+                 postprocess_workers: int = 4,
+                 batch_size: int = 8,
+                 queue_size: int = 32,
+                 gate=None,
+                 infer_workers: int = 1):
+        if min(fetch_workers, postprocess_workers, batch_size, queue_size, infer_workers) < 1:
+            raise ValueError("Pipeline concurrency settings must be at least 1")
+        self.fetch = fetch
+        self.predict_batch = predict_batch
+        self.analyze = analyze
+        self.fetch_workers = fetch_workers
+        self.postprocess_workers = postprocess_workers
+        self.infer_workers = infer_workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.gate = gate
+
+    def run(self, jobs: Iterable[Tuple[str, object]],
+            on_result: Optional[Callable[[str, Outcome], None]] = None) -> Dict[str, Outcome]:
+        """Process (camera_id, camera) jobs and return camera ID -> (result path, congestion) or exception.
+
+        on_result is called from a worker thread as soon as each camera finishes.
+        """
+        outcomes: Dict[str, Outcome] = {}
+        outcomes_lock = threading.Lock()
+
+        def finish(camera_id: str, outcome: Outcome, stage: str):
+            # stage is where the outcome was produced: fetch, motion_gate, inference or postprocess
+            with outcomes_lock:
+                outcomes[camera_id] = outcome
+            if isinstance(outcome, ImageNotModified):
+                kind = 'unchanged'
+            elif isinstance(outcome, Exception):
+                ERRORS.inc(stage=stage)
+                kind = 'error'
+            else:
+                kind = 'skipped' if stage == 'motion_gate' else 'analyzed'
+            CAMERA_REFRESHES.inc(camera_id=camera_id, outcome=kind)
+            if on_result is not None:
+                try:
+                    on_result(camera_id, outcome)
+                except Exception as e:
+                    print(f"Error in pipeline result callback for {camera_id}: {e}")
+
+        job_queue: queue.Queue = queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
+        for _ in range(self.fetch_workers):
+            job_queue.put(_DONE)
+        infer_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        post_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        queues = [('infer', infer_queue), ('post', post_queue)]
+        with _active_queues_lock:
+            _active_queues.extend(queues)
+
+        def fetch_stage():
+            while True:
+                job = job_queue.get()
+                if job is _DONE:
+                    return
+                camera_id, camera = job
+                started = time.perf_counter()
+                try:
+                    frame = self.fetch(camera_id)
+                    reused = None
+                    if self.gate is not None:
+                        with time_stage('motion_gate'):
+                            reused = self.gate.check(camera_id, frame, camera)
+                except Exception as e:
+                    finish(camera_id, e, 'fetch')
+                    continue
+                if reused is not None:
+                    finish(camera_id, reused, 'motion_gate')
+                else:
+                    infer_queue.put((camera_id, camera, frame, started))
+
+        def infer_stage():
+            done = False
+            while not done:
+                batch = []
+                item = infer_queue.get()
+                while True:
+                    if item is _DONE:
+                        done = True
+                    else:
+                        batch.append(item)
+                    if len(batch) >= self.batch_size or done:
+                        break
+                    try:
+                        item = infer_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if not batch:
+                    continue
+                INFERENCE_BATCH_FRAMES.observe(len(batch))
+                try:
+                    with time_stage('inference'):
+                        results = self.predict_batch([frame for _, _, frame, _ in batch])
+                except Exception as e:
+                    for camera_id, _, _, _ in batch:
+                        if self.gate is not None:
+                            self.gate.record(camera_id, e)
+                        finish(camera_id, e, 'inference')
+                    continue
+                for (camera_id, camera, frame, started), result in zip(batch, results):
+                    post_queue.put((camera_id, camera, frame, result, started))
+
+        def postprocess_stage():
+            while True:
+                item = post_queue.get()
+                if item is _DONE:
+                    return
+                camera_id, camera, frame, result, started = item
+                try:
+                    outcome = self.analyze(camera_id, frame, result, camera)
+                except Exception as e:
+                    outcome = e
+                if isinstance(outcome, AnalysisResult):
+                    outcome.latency = time.perf_counter() - started
+                    CAMERA_SECONDS.observe(outcome.latency, camera_id=camera_id)
+                if self.gate is not None:
+                    self.gate.record(camera_id, outcome)
+                finish(camera_id, outcome, 'postprocess')
+
+        # Each stage is closed with one sentinel per downstream thread once all of its own threads finished
+        stages = [
+            ([threading.Thread(target=fetch_stage, name=f"pipeline-fetch-{i}", daemon=True)
+              for i in range(self.fetch_workers)], infer_queue, self.infer_workers),
+            ([threading.Thread(target=infer_stage, name=f"pipeline-infer-{i}", daemon=True)
+              for i in range(self.infer_workers)], post_queue, self.postprocess_workers),
+            ([threading.Thread(target=postprocess_stage, name=f"pipeline-post-{i}", daemon=True)
+              for i in range(self.postprocess_workers)], None, 0),
+        ]
+        for threads, _, _ in stages:
+            for thread in threads:
+                thread.start()
+        for threads, next_queue, consumers in stages:
+            for thread in threads:
+                thread.join()
+            for _ in range(consumers):
+                next_queue.put(_DONE)
+        with _active_queues_lock:
+            for item in queues:
+                _active_queues.remove(item)
+        return outcomes
@@ -0,0 +1,93 @@
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+class SamplingProfiler:
+    """Samples the Python stacks of all threads at a fixed interval while running.
+
+    Unlike cProfile it sees every thread (pipeline workers, the event loop,
+    the history writer) and costs nothing while stopped. Results are folded
+    stacks, "thread;outer (file:line);...;inner (file:line) count" per line,
+    the raw format py-spy writes and flamegraph.pl and speedscope read.
+    Every run is bounded: at least MIN_INTERVAL between samples and at most
+    MAX_DURATION seconds.
+    """
+    MIN_INTERVAL = 0.005
+    MAX_DURATION = 300.0
+
+    def __init__(self):
+        self.interval = 0.01
+        self.samples = 0
+        self.started: Optional[float] = None
+        self.stops_at: Optional[float] = None
+        self._stacks: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float, duration: float) -> bool:
+        """Start sampling for duration seconds with fresh results; False if already running"""
+        if interval < self.MIN_INTERVAL:
+            raise ValueError(f"interval must be at least {self.MIN_INTERVAL} seconds")
+        if not 0 < duration <= self.MAX_DURATION:
+            raise ValueError(f"duration must be between 0 and {self.MAX_DURATION} seconds")
+        with self._lock:
+            if self.running:
+                return False
+            self.interval = interval
+            self.samples = 0
+            self._stacks = Counter()
+            self.started = time.time()
+            self.stops_at = self.started + duration
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.stops_at is not None and time.time() >= self.stops_at:
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                entries = []
+                while frame is not None:
+                    code = frame.f_code
+                    entries.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                # Numbered pool threads (pipeline-fetch-3) are merged into one root
+                thread_name = re.sub(r'[-_]\d+$', '', names.get(thread_id, str(thread_id)))
+                stacks.append(';'.join([thread_name] + entries[::-1]))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def folded(self) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": self.samples,
+            "started": self.started,
+            "stops_at": self.stops_at,
+        }
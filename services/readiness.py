@@ -0,0 +1,57 @@
+import time
+from contextlib import contextmanager
+from threading import Event, Lock
+from typing import Dict, Optional
+
+class Readiness:
+    """Startup progress of the API: timed steps, model warm-up and the first refresh.
+
+    The service is ready once the model is loaded and warmed up and the first
+    refresh batch has put data in the cache (or failed for every camera, so
+    that a dead upstream does not keep the container unready forever).
+    """
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.steps: Dict[str, float] = {}
+        self.model_ready = Event()
+        self.first_refresh = Event()
+        self.error: Optional[str] = None
+        self._lock = Lock()
+
+    def record(self, step: str, seconds: float):
+        with self._lock:
+            self.steps[step] = round(seconds, 3)
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self, event: Event, step: str):
+        """Set event once and record the time since startup as step"""
+        if not event.is_set():
+            self.record(step, time.perf_counter() - self.started)
+            event.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.model_ready.is_set() and self.first_refresh.is_set()
+
+    def report(self) -> Dict:
+        with self._lock:
+            steps = dict(self.steps)
+        return {
+            "ready": self.ready,
+            "model_ready": self.model_ready.is_set(),
+            "first_refresh": self.first_refresh.is_set(),
+            "error": self.error,
+            "uptime": round(time.perf_counter() - self.started, 3),
+            "startup_seconds": steps,
+        }
+
+    def summary(self) -> str:
+        with self._lock:
+            return ', '.join(f"{step} {seconds:.2f}s" for step, seconds in self.steps.items())
@@ -0,0 +1,180 @@
+import heapq
+import time
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from services.image_fetcher import ImageNotModified
+
+class TokenBucket:
+    """Allows rate events per second on average, with bursts of up to capacity"""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._last = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refund(self, now: float):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return max(1 - self.tokens, 0) / self.rate
+
+class CameraSchedule:
+    def __init__(self, interval: float, due: float):
+        self.interval = interval
+        self.due = due
+        self.dispatched: Optional[float] = None
+        self.last_lag = 0.0
+        self.last_completed: Optional[float] = None
+        self.last_congestion: Optional[float] = None
+        self.errors = 0
+        self.generation = 0
+
+class RefreshScheduler:
+    """Decides which cameras to refresh next, each on its own interval.
+
+    Cameras sit in a heap keyed by their next due time. After every refresh
+    the camera's interval adapts:
+
+    - congestion moved by more than change_threshold points: interval halves
+    - congestion steady, or the motion gate reused the last result: interval grows by 25%
+    - the camera had no new snapshot (ImageNotModified): interval grows by 50%,
+      which converges on the camera's own upload rate
+    - fetch/analysis error: retry after base_interval * 2^errors, up to max_backoff
+
+    Intervals stay within [min_interval, max_interval]. With budget_fps set,
+    a token bucket limits how many cameras are dispatched per second overall;
+    cameras that turn out unchanged or failed give their token back.
+    """
+    def __init__(self, base_interval: float = 15.0, min_interval: float = 5.0,
+                 max_interval: float = 120.0, max_backoff: float = 600.0,
+                 change_threshold: float = 5.0, budget_fps: float = 0.0,
+                 budget_burst: Optional[float] = None):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.change_threshold = change_threshold
+        self.budget = TokenBucket(budget_fps, budget_burst or max(budget_fps, 1)) if budget_fps > 0 else None
+        self._cameras: Dict[str, CameraSchedule] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._lock = Lock()
+
+    def _push(self, camera_id: str, schedule: CameraSchedule):
+        schedule.generation += 1
+        heapq.heappush(self._heap, (schedule.due, schedule.generation, camera_id))
+
+    def sync(self, camera_ids: Iterable[str], now: Optional[float] = None):
+        """Start scheduling new cameras (due immediately) and forget removed ones"""
+        now = time.monotonic() if now is None else now
+        camera_ids = set(camera_ids)
+        with self._lock:
+            for camera_id in camera_ids - self._cameras.keys():
+                schedule = self._cameras[camera_id] = CameraSchedule(self.base_interval, now)
+                self._push(camera_id, schedule)
+            for camera_id in self._cameras.keys() - camera_ids:
+                # Its heap entry is skipped once the camera is gone
+                del self._cameras[camera_id]
+
+    def pop_due(self, limit: int, now: Optional[float] = None) -> List[str]:
+        """Take up to limit cameras whose due time has passed, within the inference budget"""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and len(due) < limit and self._heap[0][0] <= now:
+                _, generation, camera_id = self._heap[0]
+                schedule = self._cameras.get(camera_id)
+                if schedule is None or schedule.generation != generation:
+                    heapq.heappop(self._heap)
+                    continue
+                if self.budget is not None and not self.budget.take(now):
+                    break
+                heapq.heappop(self._heap)
+                schedule.dispatched = now
+                schedule.last_lag = now - schedule.due
+                due.append(camera_id)
+        return due
+
+    def complete(self, camera_id: str, outcome, now: Optional[float] = None):
+        """Schedule a dispatched camera again based on the outcome of its refresh"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            schedule = self._cameras.get(camera_id)
+            if schedule is None or schedule.dispatched is None:
+                return
+            schedule.dispatched = None
+            schedule.last_completed = now
+            if isinstance(outcome, Exception):
+                if self.budget is not None:
+                    self.budget.refund(now)
+                if isinstance(outcome, ImageNotModified):
+                    schedule.errors = 0
+                    schedule.interval = schedule.interval * 1.5
+                else:
+                    schedule.errors += 1
+                    delay = min(self.base_interval * 2 ** schedule.errors, self.max_backoff)
+                    schedule.due = now + delay
+                    self._push(camera_id, schedule)
+                    return
+            else:
+                schedule.errors = 0
+                congestion = outcome[1]
+                previous, schedule.last_congestion = schedule.last_congestion, congestion
+                if previous is not None and abs(congestion - previous) > self.change_threshold:
+                    schedule.interval = schedule.interval / 2
+                else:
+                    schedule.interval = schedule.interval * 1.25
+            schedule.interval = min(max(schedule.interval, self.min_interval), self.max_interval)
+            schedule.due = now + schedule.interval
+            self._push(camera_id, schedule)
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until a camera can be dispatched, or None when nothing is scheduled"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._heap:
+                due, generation, camera_id = self._heap[0]
+                schedule = self._cameras.get(camera_id)
+                if schedule is not None and schedule.generation == generation:
+                    break
+                heapq.heappop(self._heap)
+            else:
+                return None
+            wait = max(due - now, 0)
+            if self.budget is not None:
+                wait = max(wait, self.budget.wait_time(now))
+            return wait
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            cameras = {}
+            for camera_id, schedule in self._cameras.items():
+                in_flight = schedule.dispatched is not None
+                cameras[camera_id] = {
+                    "interval": round(schedule.interval, 1),
+                    "due_in": None if in_flight else round(schedule.due - now, 1),
+                    # How late the camera is now, or was when last dispatched
+                    "lag": round(max(now - schedule.due, 0) if not in_flight else schedule.last_lag, 1),
+                    "in_flight": in_flight,
+                    "errors": schedule.errors,
+                }
+            return {
+                "cameras_scheduled": len(cameras),
+                "cameras_overdue": sum(1 for camera in cameras.values() if camera["due_in"] is not None
+                                       and camera["due_in"] < 0),
+                "budget_fps": self.budget.rate if self.budget is not None else None,
+                "cameras": cameras,
+            }
@@ -0,0 +1,89 @@
+import bisect
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    heartbeat REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+class HashRing:
+    """Consistent hashing of camera IDs onto instances.
+
+    Every instance owns replicas points on a 64-bit ring and a camera belongs
+    to the first point at or after its hash, so adding or removing an
+    instance only moves about 1/N of the cameras and every process computes
+    the same owners from the same member list.
+    """
+    def __init__(self, instances: Iterable[str] = (), replicas: int = 64):
+        self.instances = sorted(set(instances))
+        self.replicas = replicas
+        points = sorted((_hash(f"{instance}#{replica}"), instance)
+                        for instance in self.instances for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._owners = [instance for _, instance in points]
+
+    def owner(self, camera_id: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect_left(self._hashes, _hash(camera_id)) % len(self._hashes)
+        return self._owners[index]
+
+    def owned(self, camera_ids: Iterable[str], instance: str) -> List[str]:
+        return [camera_id for camera_id in camera_ids if self.owner(camera_id) == instance]
+
+class ShardCoordinator:
+    """Instance membership in a SQLite file shared by the analyzers and the aggregator.
+
+    Analyzers heartbeat their row every few seconds; an instance whose
+    heartbeat is older than ttl seconds is considered gone, and the ring is
+    rebuilt from the live members, so cameras move when instances join,
+    leave or die. Suitable for processes on one host or a shared volume.
+    """
+    def __init__(self, path: str, ttl: float = 15.0, replicas: int = 64):
+        self.path = path
+        self.ttl = ttl
+        self.replicas = replicas
+        self._ring = HashRing((), replicas)
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def heartbeat(self, instance_id: str, url: str):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO instances VALUES (?, ?, ?) "
+                "ON CONFLICT (instance_id) DO UPDATE SET url = excluded.url, heartbeat = excluded.heartbeat",
+                (instance_id, url, time.time()))
+
+    def leave(self, instance_id: str):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM instances WHERE instance_id = ?", (instance_id,))
+
+    def members(self) -> Dict[str, str]:
+        """instance_id -> url of the live instances"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT instance_id, url FROM instances WHERE heartbeat >= ?",
+                                      (time.time() - self.ttl,)).fetchall()
+        return dict(sorted(rows))
+
+    def ring(self, members: Optional[Iterable[str]] = None) -> HashRing:
+        """Ring over the live instances, rebuilt only when membership changed"""
+        instances = sorted(self.members() if members is None else members)
+        with self._lock:
+            if instances != self._ring.instances:
+                self._ring = HashRing(instances, self.replicas)
+            return self._ring
@@ -0,0 +1,238 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from services.congestion_analyzer import CongestionAnalyzer
+from services.metrics import time_stage
+from services.pipeline import AnalysisResult
+from utils.geometry import GeometryCalculator
+from visualization.renderer import TrafficVisualizer
+
+# (shared memory name, shape, dtype) - all a worker needs to attach to an array
+Descriptor = Tuple[str, Tuple[int, ...], str]
+
+class SharedArray:
+    """A NumPy array backed by a named shared memory block.
+
+    Only the descriptor is pickled when it is sent to another process.
+    The process that created the block unlinks it on close().
+    """
+    def __init__(self, shape: Tuple[int, ...], dtype, name: Optional[str] = None):
+        self.owner = name is None
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def copy_of(cls, array: np.ndarray) -> 'SharedArray':
+        shared = cls(array.shape, array.dtype)
+        np.copyto(shared.array, array)
+        return shared
+
+    @classmethod
+    def attach(cls, descriptor: Descriptor) -> 'SharedArray':
+        name, shape, dtype = descriptor
+        return cls(shape, dtype, name)
+
+    @property
+    def descriptor(self) -> Descriptor:
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    def close(self):
+        # Views of the buffer must be gone before the block can be closed
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+# (class ids, confidences, box centers, class names) of one frame's detections
+Boxes = Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[int, str]]
+
+class SharedDetections:
+    """One frame's inference output, with the frame and instance map still in shared memory"""
+    def __init__(self, frame: SharedArray, mask: Optional[SharedArray], segments: List[np.ndarray],
+                 boxes: Optional[Boxes] = None):
+        self.frame = frame
+        self.mask = mask
+        self.segments = segments
+        self.boxes = boxes
+        self.vehicle_count = len(boxes[0]) if boxes is not None else 0
+
+    def close(self):
+        self.frame.close()
+        if self.mask is not None:
+            self.mask.close()
+
+def _init_inference(threads: int):
+    # Runs once per inference process: load the model before the first batch arrives
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    from models.yolo_model import YOLOModel
+    YOLOModel()
+
+def _warm_up(shape: Tuple[int, int, int], batch_size: int):
+    from models.yolo_model import YOLOModel
+    YOLOModel().warm_up(shape, batch_size)
+
+def _infer(frames: List[Descriptor], masks: List[Descriptor], batch_size: int,
+           polygons: bool) -> List[Tuple[List[np.ndarray], bool, Boxes]]:
+    """Predict shared frames; fills the shared instance maps and returns (segments, has_mask, boxes) per frame.
+
+    Segments are only extracted when polygons is set, i.e. for the polygon congestion modes.
+    """
+    from models.yolo_model import YOLOModel
+    shared = [SharedArray.attach(descriptor) for descriptor in frames]
+    results = result = None
+    try:
+        results = YOLOModel().predict_batch([frame.array for frame in shared], batch_size=batch_size)
+        detections = []
+        for result, descriptor in zip(results, masks):
+            instance_map = YOLOModel.instance_map(result)
+            if instance_map is not None:
+                mask = SharedArray.attach(descriptor)
+                np.copyto(mask.array, instance_map)
+                mask.close()
+            segments = YOLOModel.segments(result) if polygons else []
+            detections.append((segments, instance_map is not None,
+                               (*YOLOModel.detections(result), getattr(result, 'names', {}))))
+        return detections
+    finally:
+        # Results keep views of the shared frames
+        results = result = None
+        for frame in shared:
+            frame.close()
+
+def _init_postprocess():
+    # One frame per process; OpenCV's own threads would only oversubscribe the cores
+    cv2.setNumThreads(1)
+
+def _postprocess(camera_id: str, frame: Descriptor, mask: Optional[Descriptor],
+                 segments: List[np.ndarray], boxes: Boxes, roi_points: List[Tuple[int, int]],
+                 analysis_scale: float, analyzer_options: Dict,
+                 output_dir: Optional[str]) -> Tuple[Optional[str], float, Dict]:
+    """Congestion and occupancy of one shared frame.
+
+    Also draws and saves the result image when output_dir is given.
+    analyzer_options are the CongestionAnalyzer keyword arguments.
+    """
+    roi = CongestionAnalyzer.get_roi(roi_points)
+    shared_frame = SharedArray.attach(frame)
+    shared_mask = SharedArray.attach(mask) if mask is not None else None
+    instance_map = union_mask = None
+    try:
+        analyzer = CongestionAnalyzer(GeometryCalculator(), **analyzer_options)
+        instance_map = shared_mask.array if shared_mask is not None else None
+        if analyzer.mode == 'mask' and instance_map is not None:
+            union_mask = (instance_map > 0).astype(np.uint8)
+        congestion_percentage = analyzer.measure(
+            segments, union_mask, roi, shared_frame.array.shape[:2], scale=analysis_scale)
+        stats = {"occupancy": analyzer.calculate_occupancy(instance_map, *boxes, roi)}
+        output_path = None
+        if output_dir is not None:
+            output_path = os.path.join(output_dir, f'{camera_id}.jpg')
+            buffers = TrafficVisualizer.get_buffers(camera_id, shared_frame.array.shape)
+            result_frame = TrafficVisualizer.draw_results(
+                shared_frame.array, roi.points, segments, congestion_percentage, union_mask, buffers)
+            cv2.imwrite(output_path, result_frame)
+        return output_path, congestion_percentage, stats
+    finally:
+        instance_map = union_mask = None
+        shared_frame.close()
+        if shared_mask is not None:
+            shared_mask.close()
+
+class WorkerPool:
+    """Inference and post-processing in worker processes, off the API process's GIL.
+
+    Frames and instance maps (YOLOModel.instance_map) are handed over through
+    multiprocessing.shared_memory, so only descriptors, the vehicle polygons
+    and the box arrays are pickled. Every inference
+    process loads YOLOModel once when it starts; post-processing processes run
+    the congestion geometry and, when an output_dir is given, render and save
+    the result image. Each pipeline thread waits on one worker, so the pipeline
+    should run one inference thread per inference process and one
+    post-processing thread per post-processing process.
+    """
+    def __init__(self, inference_workers: int = 1, postprocess_workers: int = 4,
+                 inference_threads: int = 0, batch_size: int = 8,
+                 mode: str = 'union', exact_union: bool = False, count_mode: str = 'centroid',
+                 min_overlap: float = 0.5, min_confidence: float = 0.5):
+        if min(inference_workers, postprocess_workers, batch_size) < 1:
+            raise ValueError("Worker pool sizes must be at least 1")
+        self.analyzer_options = dict(mode=mode, exact_union=exact_union, count_mode=count_mode,
+                                     min_overlap=min_overlap, min_confidence=min_confidence)
+        # Validates the options before any process is started
+        CongestionAnalyzer(GeometryCalculator(), **self.analyzer_options)
+        self.inference_workers = inference_workers
+        self.postprocess_workers = postprocess_workers
+        self.batch_size = batch_size
+        self.mode = mode
+        # Fresh interpreters: forking a process that already runs threads and torch is unsafe
+        context = multiprocessing.get_context('spawn')
+        self._inference = ProcessPoolExecutor(
+            inference_workers, mp_context=context,
+            initializer=_init_inference, initargs=(inference_threads,))
+        self._postprocess = ProcessPoolExecutor(
+            postprocess_workers, mp_context=context, initializer=_init_postprocess)
+
+    def warm_up(self, shape: Tuple[int, int, int] = (288, 512, 3)):
+        """Start every worker process and run a dummy batch in each inference process"""
+        futures = [self._inference.submit(_warm_up, shape, self.batch_size)
+                   for _ in range(self.inference_workers)]
+        futures += [self._postprocess.submit(int) for _ in range(self.postprocess_workers)]
+        for future in futures:
+            future.result()
+
+    def predict_batch(self, frames: List[np.ndarray]) -> List[SharedDetections]:
+        """Run frames through an inference worker; the caller must close() each returned detection"""
+        shared_frames = [SharedArray.copy_of(frame) for frame in frames]
+        shared_masks = [SharedArray(frame.shape[:2], np.uint16) for frame in frames]
+        try:
+            detections = self._inference.submit(
+                _infer, [frame.descriptor for frame in shared_frames],
+                [mask.descriptor for mask in shared_masks],
+                self.batch_size, self.mode != 'mask').result()
+        except Exception:
+            for frame, mask in zip(shared_frames, shared_masks):
+                SharedDetections(frame, mask, []).close()
+            raise
+        outputs = []
+        for frame, mask, (segments, has_mask, boxes) in zip(shared_frames, shared_masks, detections):
+            if not has_mask:
+                mask.close()
+                mask = None
+            outputs.append(SharedDetections(frame, mask, segments, boxes))
+        return outputs
+
+    def analyze(self, camera_id: str, frame: np.ndarray, detections: SharedDetections,
+                roi_points: List[Tuple[int, int]], analysis_scale: float = 1.0,
+                output_dir: Optional[str] = None, render_cache=None) -> AnalysisResult:
+        """Post-process one frame in a worker and release its shared memory.
+
+        With a render_cache the frame and detections are stored for on-demand
+        rendering in this process instead of being drawn by the worker.
+        """
+        try:
+            with time_stage('postprocess'):
+                output_path, congestion_percentage, stats = self._postprocess.submit(
+                    _postprocess, camera_id, detections.frame.descriptor,
+                    detections.mask.descriptor if detections.mask is not None else None,
+                    detections.segments, detections.boxes, roi_points, analysis_scale,
+                    self.analyzer_options, None if render_cache is not None else output_dir).result()
+            if render_cache is not None:
+                union_mask = None
+                if self.mode == 'mask' and detections.mask is not None:
+                    union_mask = (detections.mask.array > 0).astype(np.uint8)
+                render_cache.store(camera_id, frame, roi_points, detections.segments, union_mask,
+                                   congestion_percentage)
+            return AnalysisResult(output_path, congestion_percentage, detections.vehicle_count, **stats)
+        finally:
+            detections.close()
+
+    def close(self):
+        self._inference.shutdown(cancel_futures=True)
+        self._postprocess.shutdown(cancel_futures=True)
@@ -0,0 +1,151 @@
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+import cv2
+from models.yolo_model import YOLOModel
+from services.camera_registry import CameraRegistry
+from services.congestion_smoother import CongestionSmoother
+from main import get_analysis_scale, get_camera, measure_congestion
+
+class VideoStream:
+    """One camera's cv2.VideoCapture source with frame skipping"""
+    def __init__(self, camera_id: str, source: str, realtime: Optional[bool] = None):
+        self.camera_id = camera_id
+        self.source = source
+        capture_source = int(source) if source.isdigit() else source
+        self.capture = cv2.VideoCapture(capture_source)
+        if not self.capture.isOpened():
+            raise Exception(f"Could not open video source {source}")
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 25.0
+        # Live sources keep producing frames while we infer, files wait for us
+        self.realtime = not os.path.isfile(source) if realtime is None else realtime
+        self.frame_index = -1
+        self.skipped = 0
+        self.finished = False
+
+    def read(self, skip: int):
+        """Discard skip frames without decoding them and return the next one, or None at the end"""
+        for _ in range(skip):
+            if not self.capture.grab():
+                self.finished = True
+                return None
+            self.frame_index += 1
+            self.skipped += 1
+        ok, frame = self.capture.read()
+        if not ok:
+            self.finished = True
+            return None
+        self.frame_index += 1
+        return frame
+
+    def position(self) -> float:
+        # Seconds into the stream, from the frame counter
+        return self.frame_index / self.fps
+
+    def close(self):
+        self.capture.release()
+
+class StreamAnalyzer:
+    """Continuous congestion monitoring over video files or streams.
+
+    Frames are analyzed at target_fps (in stream time). When a realtime
+    source falls behind because inference took longer than the frame budget,
+    the frames that arrived meanwhile are skipped. All streams due in a
+    round share one batched inference call.
+    """
+    def __init__(self, streams: List[VideoStream], registry: CameraRegistry,
+                 target_fps: float = 1.0, ema_alpha: float = 0.3, window: int = 10,
+                 batch_size: int = 8):
+        if target_fps <= 0:
+            raise ValueError("target_fps must be positive")
+        self.streams = streams
+        self.registry = registry
+        self.target_fps = target_fps
+        self.batch_size = batch_size
+        self.smoothers: Dict[str, CongestionSmoother] = {
+            stream.camera_id: CongestionSmoother(ema_alpha, window) for stream in streams}
+
+    def run(self, max_samples: Optional[int] = None) -> Iterator[Dict]:
+        """Yield one smoothed congestion sample per analyzed frame and camera"""
+        yolo_model = YOLOModel()
+        skips = {stream.camera_id: 0 for stream in self.streams}
+        emitted = 0
+        try:
+            while True:
+                active = [stream for stream in self.streams if not stream.finished]
+                if not active:
+                    return
+                frames, due = [], []
+                for stream in active:
+                    frame = stream.read(skips[stream.camera_id])
+                    if frame is not None:
+                        frames.append(frame)
+                        due.append(stream)
+                if not frames:
+                    continue
+
+                start = time.perf_counter()
+                results = yolo_model.predict_batch(frames, batch_size=self.batch_size, verbose=False)
+                for stream, frame, result in zip(due, frames, results):
+                    camera = get_camera(self.registry, stream.camera_id)
+                    congestion, _, _ = measure_congestion(
+                        frame, result, camera.roi, get_analysis_scale(camera))
+                    sample = self.smoothers[stream.camera_id].update(congestion)
+                    yield {"camera_id": stream.camera_id, "stream_time": round(stream.position(), 3),
+                           "frame_index": stream.frame_index, "skipped": stream.skipped, **sample}
+                    emitted += 1
+                    if max_samples is not None and emitted >= max_samples:
+                        return
+                elapsed = time.perf_counter() - start
+
+                for stream in due:
+                    stride = max(int(round(stream.fps / self.target_fps)), 1)
+                    behind = math.ceil(elapsed * stream.fps) if stream.realtime else 0
+                    skips[stream.camera_id] = max(stride, behind) - 1
+        finally:
+            for stream in self.streams:
+                stream.close()
+
+def parse_stream(value: str):
+    camera_id, _, source = value.partition('=')
+    if not camera_id or not source:
+        raise argparse.ArgumentTypeError("expected CAMERA_ID=SOURCE")
+    return camera_id, source
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor congestion continuously from video files or streams")
+    parser.add_argument('streams', nargs='+', type=parse_stream, metavar='CAMERA_ID=SOURCE',
+                        help="camera ID from camera_coordinates.json and a video file, URL or device index")
+    parser.add_argument('--fps', type=float, default=1.0, help="target analysis frames per second")
+    parser.add_argument('--ema-alpha', type=float, default=0.3)
+    parser.add_argument('--window', type=int, default=10, help="rolling mean window in samples")
+    parser.add_argument('--realtime', action='store_true',
+                        help="skip frames when behind even for video files, as if they were live")
+    parser.add_argument('--max-samples', type=int)
+    parser.add_argument('--output', help="CSV file for the time series (default: stdout)")
+    args = parser.parse_args()
+
+    registry = CameraRegistry('camera_coordinates.json', 'cam.json')
+    streams = [VideoStream(camera_id, source, realtime=True if args.realtime else None)
+               for camera_id, source in args.streams]
+    analyzer = StreamAnalyzer(streams, registry, args.fps, args.ema_alpha, args.window)
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=[
+            "camera_id", "stream_time", "frame_index", "skipped", "raw", "ema", "rolling_mean"])
+        writer.writeheader()
+        for sample in analyzer.run(args.max_samples):
+            writer.writerow(sample)
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
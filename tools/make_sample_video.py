@@ -0,0 +1,28 @@
+import argparse
+import glob
+import cv2
+
+def main():
+    # Build a local test video from the sample snapshots for stream.py
+    parser = argparse.ArgumentParser(description="Write the sample images into a looping test video")
+    parser.add_argument('--images', default='data/*.jpg')
+    parser.add_argument('--output', default='data/sample.mp4')
+    parser.add_argument('--fps', type=float, default=10.0)
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--hold', type=float, default=2.0, help="seconds each image stays on screen")
+    args = parser.parse_args()
+
+    images = [cv2.imread(path) for path in sorted(glob.glob(args.images))]
+    images = [image for image in images if image is not None]
+    if not images:
+        raise SystemExit(f"No images matched {args.images}")
+    height, width = images[0].shape[:2]
+    writer = cv2.VideoWriter(args.output, cv2.VideoWriter_fourcc(*'mp4v'), args.fps, (width, height))
+    for index in range(int(args.fps * args.seconds)):
+        image = images[int(index / (args.fps * args.hold)) % len(images)]
+        writer.write(cv2.resize(image, (width, height)))
+    writer.release()
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+def start(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, '-m', 'uvicorn', module, '--host', '127.0.0.1', '--port', str(port),
+                             '--timeout-graceful-shutdown', '5'], env=env)
+
+def main():
+    # Run N sharded analyzers and the aggregator on one machine, e.g. to try rebalancing
+    parser = argparse.ArgumentParser(description="Launch sharded api.py instances and the aggregator locally")
+    parser.add_argument('--shards', type=int, default=3)
+    parser.add_argument('--base-port', type=int, default=8001, help="port of the first analyzer instance")
+    parser.add_argument('--port', type=int, default=8000, help="aggregator port")
+    parser.add_argument('--coordinator', default='shards.db', help="SQLite membership file")
+    args = parser.parse_args()
+
+    base_env = {**os.environ, 'SHARD_COORDINATOR': os.path.abspath(args.coordinator), 'PYTHONUNBUFFERED': '1'}
+    processes = []
+    for index in range(args.shards):
+        port = args.base_port + index
+        processes.append(start('api:app', port, {
+            **base_env,
+            'SHARD_ID': f'shard-{index}',
+            'SHARD_URL': f'http://127.0.0.1:{port}',
+            # One history file per instance; the aggregator merges them per request
+            'HISTORY_DB': os.environ.get('HISTORY_DB', 'history.db') and f'history-shard-{index}.db',
+        }))
+    processes.append(start('aggregator:app', args.port, base_env))
+    print(f"{args.shards} analyzers on ports {args.base_port}-{args.base_port + args.shards - 1}, "
+          f"aggregator on http://127.0.0.1:{args.port}; Ctrl-C stops all. Stop one analyzer "
+          f"(kill <pid>) to watch its cameras move to the others.")
+    print("PIDs: " + ', '.join(str(process.pid) for process in processes))
+    # Stopping the launcher (Ctrl-C or kill) stops every instance
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while any(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+if __name__ == "__main__":
+    main()
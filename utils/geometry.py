@@ -1,6 +1,66 @@
 import numpy as np
 import cv2
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from shapely.geometry import Polygon
+    from shapely.ops import unary_union
+except ImportError:  # Optional, only needed for the exact union of clipped polygons
+    Polygon = None
+
+class RegionOfInterest:
+    """ROI polygon with its rasterized artifacts cached per image size"""
+    def __init__(self, points: List[Tuple[int, int]]):
+        self.points = [tuple(point) for point in points]
+        self.polygon = np.array(self.points, dtype=np.int32).reshape((-1, 2))
+        self.area = GeometryCalculator.calculate_polygon_area(self.points)
+        self.bounding_box = cv2.boundingRect(self.polygon)
+        self.is_convex = GeometryCalculator.is_convex(self.polygon)
+        self._clip_polygons: Dict[Tuple[int, int], np.ndarray] = {}
+        self._masks: Dict[Tuple[int, int], Tuple[Tuple[int, int, int, int], np.ndarray]] = {}
+        self._scaled: Dict[float, 'RegionOfInterest'] = {}
+
+    def scaled(self, scale: float) -> 'RegionOfInterest':
+        """Return this ROI with its points scaled for a downscaled analysis resolution"""
+        if scale == 1:
+            return self
+        region = self._scaled.get(scale)
+        if region is None:
+            points = np.round(self.polygon * scale).astype(np.int32)
+            region = self._scaled[scale] = RegionOfInterest(points.tolist())
+        return region
+
+    def get_mask(self, image_size: Tuple[int, int]) -> Tuple[Tuple[int, int, int, int], np.ndarray]:
+        """Return the ROI bounding box (x, y, w, h) clipped to image_size and the mask cropped to it"""
+        image_size = tuple(image_size)
+        cached = self._masks.get(image_size)
+        if cached is not None:
+            return cached
+
+        height, width = image_size
+        x, y, w, h = self.bounding_box
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, width), min(y + h, height)
+        bbox = (x0, y0, max(x1 - x0, 0), max(y1 - y0, 0))
+
+        mask = np.zeros((bbox[3], bbox[2]), dtype=np.uint8)
+        if mask.size:
+            cv2.fillPoly(mask, [self.polygon], 1, offset=(-x0, -y0))
+        self._masks[image_size] = (bbox, mask)
+        return bbox, mask
+
+    def get_clip_polygon(self, image_size: Tuple[int, int]) -> np.ndarray:
+        """Counter-clockwise float ROI polygon limited to the image, for analytic clipping"""
+        image_size = tuple(image_size)
+        polygon = self._clip_polygons.get(image_size)
+        if polygon is None:
+            polygon = self.polygon.astype(np.float64)
+            if GeometryCalculator.signed_area(polygon) < 0:
+                polygon = polygon[::-1].copy()
+            height, width = image_size
+            frame = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float64)
+            polygon = self._clip_polygons[image_size] = GeometryCalculator.clip_polygon(polygon, frame)
+        return polygon
 
 class GeometryCalculator:
     @staticmethod
@@ -22,4 +82,140 @@ class GeometryCalculator:
         cv2.fillPoly(segment_mask, [segment_polygon.astype(np.int32)], 1)
         
         intersection = cv2.bitwise_and(mask, segment_mask)
-        return cv2.countNonZero(intersection) 
\ No newline at end of file
+        return cv2.countNonZero(intersection)
+
+    @staticmethod
+    def calculate_covered_area(segments: List[np.ndarray], roi: RegionOfInterest,
+                               image_size: Tuple[int, int], union: bool = True) -> float:
+        """Pixel area of the ROI covered by segments, rasterized once inside the ROI bounding box.
+
+        With union=False every segment is counted on its own, so overlapping
+        vehicles are summed like the legacy per-segment path.
+        """
+        (x, y, w, h), roi_mask = roi.get_mask(image_size)
+        if not segments or roi_mask.size == 0:
+            return 0
+
+        segment_mask = np.zeros_like(roi_mask)
+        if union:
+            # fillPoly with several polygons uses even-odd filling, so overlaps
+            # would become holes; fill each segment into the shared buffer instead
+            for segment in segments:
+                cv2.fillPoly(segment_mask, [np.asarray(segment, dtype=np.int32).reshape((-1, 2))],
+                             1, offset=(-x, -y))
+            return cv2.countNonZero(cv2.bitwise_and(roi_mask, segment_mask))
+
+        total_area = 0
+        for segment in segments:
+            segment_mask.fill(0)
+            cv2.fillPoly(segment_mask, [np.asarray(segment, dtype=np.int32).reshape((-1, 2))],
+                         1, offset=(-x, -y))
+            total_area += cv2.countNonZero(cv2.bitwise_and(roi_mask, segment_mask))
+        return total_area
+
+    @staticmethod
+    def calculate_mask_coverage(mask: np.ndarray, roi: RegionOfInterest) -> float:
+        """Pixel area of the ROI covered by a 0/1 mask at the ROI's image resolution"""
+        (x, y, w, h), roi_mask = roi.get_mask(mask.shape[:2])
+        if roi_mask.size == 0:
+            return 0
+        return cv2.countNonZero(cv2.bitwise_and(roi_mask, mask[y:y + h, x:x + w]))
+
+    @staticmethod
+    def signed_area(points: np.ndarray) -> float:
+        # Shoelace area, positive when the winding matches the inside test of clip_polygon
+        x, y = points[:, 0], points[:, 1]
+        return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+    @staticmethod
+    def is_convex(points: np.ndarray) -> bool:
+        points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+        edges = np.roll(points, -1, axis=0) - points
+        turns = edges[:, 0] * np.roll(edges[:, 1], -1) - edges[:, 1] * np.roll(edges[:, 0], -1)
+        turns = turns[turns != 0]
+        return len(points) >= 3 and (bool(np.all(turns > 0)) or bool(np.all(turns < 0)))
+
+    @staticmethod
+    def clip_polygons(points: np.ndarray, ids: np.ndarray,
+                      clip: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sutherland-Hodgman clip of many polygons against a convex polygon with positive signed area.
+
+        The subject polygons are passed flattened: points holds every vertex
+        and ids (sorted) the polygon each vertex belongs to. Each clip edge is
+        applied to all vertices of all polygons at once. Returns the clipped
+        polygons in the same flattened form; fully clipped polygons disappear.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+        ids = np.asarray(ids)
+        for a, b in zip(clip, np.roll(clip, -1, axis=0)):
+            if len(points) == 0:
+                break
+            following_index = GeometryCalculator._following_index(ids)
+            following = points[following_index]
+            edge = b - a
+            # Signed distance-like value, >= 0 on the inner side of the edge
+            side = edge[0] * (points[:, 1] - a[1]) - edge[1] * (points[:, 0] - a[0])
+            side_following = side[following_index]
+            inside_following = side_following >= 0
+
+            crossing = (side >= 0) != inside_following
+            denominator = np.where(crossing, side - side_following, 1)
+            t = (side / denominator)[:, None]
+            intersections = points + t * (following - points)
+
+            # Per vertex pair, emit [intersection if the edge crosses, following vertex if inside]
+            keep = np.stack([crossing, inside_following], axis=1)
+            points = np.stack([intersections, following], axis=1)[keep]
+            ids = np.repeat(ids, keep.sum(axis=1))
+        return points, ids
+
+    @staticmethod
+    def _following_index(ids: np.ndarray) -> np.ndarray:
+        # Index of the next vertex of the same polygon, wrapping to its first vertex
+        following = np.arange(1, len(ids) + 1)
+        last = np.flatnonzero(np.append(ids[1:] != ids[:-1], True))
+        first = np.append(0, last[:-1] + 1)
+        following[last] = first
+        return following
+
+    @staticmethod
+    def clip_polygon(subject: np.ndarray, clip: np.ndarray) -> np.ndarray:
+        """Clip a single polygon against a convex polygon, see clip_polygons"""
+        subject = np.asarray(subject, dtype=np.float64).reshape((-1, 2))
+        points, _ = GeometryCalculator.clip_polygons(subject, np.zeros(len(subject), dtype=np.int64), clip)
+        return points
+
+    @staticmethod
+    def calculate_polygon_areas(points: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Shoelace area of every polygon in a flattened (points, ids) set, indexed by id"""
+        if len(points) == 0:
+            return np.zeros(0)
+        following = points[GeometryCalculator._following_index(ids)]
+        cross = points[:, 0] * following[:, 1] - points[:, 1] * following[:, 0]
+        return 0.5 * np.abs(np.bincount(ids, weights=cross))
+
+    @staticmethod
+    def calculate_clipped_area(segments: List[np.ndarray], roi: RegionOfInterest,
+                               image_size: Tuple[int, int], union: bool = False) -> float:
+        """Area of the ROI covered by segments, computed analytically without image buffers.
+
+        The ROI must be convex. With union=False overlapping vehicles are summed;
+        union=True merges the clipped polygons exactly and needs shapely.
+        """
+        if not roi.is_convex:
+            raise ValueError("Polygon clipping requires a convex ROI")
+        clip = roi.get_clip_polygon(image_size)
+        segments = [np.asarray(segment).reshape((-1, 2)) for segment in segments]
+        if not segments:
+            return 0
+        ids = np.repeat(np.arange(len(segments)), [len(segment) for segment in segments])
+        points, ids = GeometryCalculator.clip_polygons(np.concatenate(segments), ids, clip)
+        if len(points) == 0:
+            return 0
+        if not union:
+            return float(GeometryCalculator.calculate_polygon_areas(points, ids).sum())
+        if Polygon is None:
+            raise ImportError("The exact union of clipped polygons requires shapely")
+        # buffer(0) repairs self-intersecting outlines produced by the segmentation model
+        polygons = np.split(points, np.flatnonzero(ids[1:] != ids[:-1]) + 1)
+        return unary_union([Polygon(polygon).buffer(0) for polygon in polygons if len(polygon) >= 3]).area
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from services.metrics import RENDER_CACHE_REQUESTS
+from visualization.renderer import TrafficVisualizer
+
+class FrameRecord:
+    """Everything needed to draw a camera's latest result"""
+    def __init__(self, version: int, frame: np.ndarray, roi_points: List[Tuple[int, int]],
+                 segments: List[np.ndarray], union_mask: Optional[np.ndarray], congestion: float):
+        self.version = version
+        self.frame = frame
+        self.roi_points = roi_points
+        self.segments = segments
+        self.union_mask = union_mask
+        self.congestion = congestion
+
+class RenderCache:
+    """Renders result images on demand instead of on every refresh cycle.
+
+    Analysis stores the latest frame and detections per camera; the JPEG
+    is drawn and encoded only when it is requested, then kept in a bounded
+    LRU keyed by (camera, frame version, width). Cameras listed in
+    prerender are rendered as soon as a new frame is stored.
+    """
+    def __init__(self, max_entries: int = 64, jpeg_quality: int = 90,
+                 max_width: Optional[int] = None, prerender: Iterable[str] = ()):
+        self.max_entries = max_entries
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.prerender = set(prerender)
+        self._frames: Dict[str, FrameRecord] = {}
+        self._jpegs: 'OrderedDict[Tuple[str, int, Optional[int]], bytes]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def store(self, camera_id: str, frame: np.ndarray, roi_points: List[Tuple[int, int]],
+              segments: List[np.ndarray], union_mask: Optional[np.ndarray], congestion: float) -> int:
+        """Record a newly analyzed frame and return its version"""
+        with self._lock:
+            version = self._versions.get(camera_id, 0) + 1
+            self._versions[camera_id] = version
+            # The previous version can no longer be requested
+            for key in [key for key in self._jpegs if key[:2] == (camera_id, version - 1)]:
+                del self._jpegs[key]
+            self._frames[camera_id] = FrameRecord(
+                version, frame, roi_points, segments, union_mask, congestion)
+        if camera_id in self.prerender:
+            self.get_jpeg(camera_id)
+        return version
+
+    def version(self, camera_id: str) -> Optional[int]:
+        with self._lock:
+            record = self._frames.get(camera_id)
+            return record.version if record else None
+
+    def get_jpeg(self, camera_id: str, width: Optional[int] = None) -> Optional[Tuple[int, bytes]]:
+        """Return (version, JPEG bytes) of the camera's latest result, rendering it if needed.
+
+        width requests a thumbnail no wider than that; it is capped by max_width.
+        """
+        if self.max_width:
+            width = min(width, self.max_width) if width else self.max_width
+        with self._lock:
+            record = self._frames.get(camera_id)
+            if record is None:
+                return None
+            key = (camera_id, record.version, width)
+            jpeg = self._jpegs.get(key)
+            if jpeg is not None:
+                self._jpegs.move_to_end(key)
+                RENDER_CACHE_REQUESTS.inc(result='hit')
+                return record.version, jpeg
+        RENDER_CACHE_REQUESTS.inc(result='miss')
+
+        # Render outside the lock; concurrent requests may both render, which is harmless
+        jpeg = TrafficVisualizer.render_jpeg(
+            camera_id, record.frame, record.roi_points, record.segments, record.congestion,
+            record.union_mask, quality=self.jpeg_quality, max_width=width)
+
+        with self._lock:
+            self._jpegs[key] = jpeg
+            self._jpegs.move_to_end(key)
+            while len(self._jpegs) > self.max_entries:
+                self._jpegs.popitem(last=False)
+        return record.version, jpeg
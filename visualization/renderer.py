@@ -1,33 +1,133 @@
 import cv2
 import numpy as np
-from typing import List, Tuple
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional, Tuple
+from services.metrics import time_stage
+
+class RenderBuffers:
+    """Scratch images reused across cycles when rendering one camera"""
+    def __init__(self, shape: Tuple[int, ...]):
+        self.lock = Lock()
+        self.output = np.empty(shape, dtype=np.uint8)
+        self.overlay = np.empty(shape, dtype=np.uint8)
+        self._color: Optional[np.ndarray] = None
+        self._color_value: Optional[Tuple[int, int, int]] = None
+
+    def color(self, value: Tuple[int, int, int]) -> np.ndarray:
+        """Frame-sized image of a solid color, used as the source of masked fills"""
+        if self._color is None or self._color_value != value:
+            self._color = np.empty(self.output.shape, dtype=np.uint8)
+            self._color[:] = value
+            self._color_value = value
+        return self._color
 
 class TrafficVisualizer:
+    primary_color = (118, 205, 48)
+    secondary_color = (190, 235, 189)
+    text_color = (189, 255, 247)
+    alpha = 0.5
+    # Cameras whose scratch buffers are kept, least recently rendered are dropped first
+    max_buffered_cameras = 64
+    _buffers: 'OrderedDict[str, RenderBuffers]' = OrderedDict()
+    _buffers_lock = Lock()
+
     @staticmethod
-    def draw_results(frame: np.ndarray, 
+    def draw_results(frame: np.ndarray,
                     roi_coordinates: List[Tuple[int, int]],
                     processed_segments: List[np.ndarray],
-                    congestion_percentage: float) -> np.ndarray:
-        overlay = frame.copy()
-        primary_color = (118, 205, 48)
-        secondary_color = (190, 235, 189)
-        text_color = (189, 255, 247)
-
-        # Draw ROI
-        cv2.polylines(overlay, [np.array(roi_coordinates, dtype=np.int32)], 
-                     True, secondary_color, 2)
-        
-        # Draw segments
-        for segment in processed_segments:
-            cv2.polylines(overlay, [segment], True, primary_color, 2)
-            cv2.fillPoly(overlay, [segment], primary_color,50)
-
-        # Blend overlay
-        alpha = 0.5
-        result = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
-        
+                    congestion_percentage: float,
+                    union_mask: Optional[np.ndarray] = None,
+                    buffers: Optional[RenderBuffers] = None) -> np.ndarray:
+        """Draw ROI, vehicles and congestion onto a copy of frame.
+
+        Only the bounding box of the drawn content is blended. Pass buffers
+        to draw into reusable scratch images; the returned image is then
+        buffers.output and is overwritten by the next call.
+        """
+        if buffers is None or buffers.output.shape != frame.shape:
+            buffers = RenderBuffers(frame.shape)
+        result, overlay = buffers.output, buffers.overlay
+        np.copyto(result, frame)
+        cls = TrafficVisualizer
+
+        roi_polygon = np.array(roi_coordinates, dtype=np.int32).reshape((-1, 1, 2))
+        segments = [np.asarray(segment, dtype=np.int32).reshape((-1, 1, 2))
+                    for segment in processed_segments if len(segment)]
+
+        # Region touched by any drawing, padded for the 2px outlines
+        x, y, w, h = cv2.boundingRect(np.concatenate([roi_polygon] + segments))
+        if union_mask is not None and cv2.countNonZero(union_mask):
+            mx, my, mw, mh = cv2.boundingRect(union_mask)
+            x, y, w, h = (min(x, mx), min(y, my),
+                          max(x + w, mx + mw) - min(x, mx), max(y + h, my + mh) - min(y, my))
+        height, width = frame.shape[:2]
+        x0, y0 = max(x - 2, 0), max(y - 2, 0)
+        x1, y1 = min(x + w + 2, width), min(y + h + 2, height)
+
+        if x1 > x0 and y1 > y0:
+            crop = (slice(y0, y1), slice(x0, x1))
+            np.copyto(overlay[crop], frame[crop])
+
+            # Draw ROI
+            cv2.polylines(overlay, [roi_polygon], True, cls.secondary_color, 2)
+
+            # Fill vehicles. Segments are filled one by one because fillPoly with
+            # several polygons uses even-odd filling and would leave overlaps empty
+            if union_mask is not None:
+                cv2.copyTo(buffers.color(cls.primary_color)[crop], union_mask[crop], overlay[crop])
+            else:
+                for segment in segments:
+                    cv2.fillPoly(overlay, [segment], cls.primary_color)
+
+            # Draw all segment outlines in one call
+            if segments:
+                cv2.polylines(overlay, segments, True, cls.primary_color, 2)
+
+            # Blend overlay inside the drawn region only; elsewhere it equals the frame
+            cv2.addWeighted(overlay[crop], cls.alpha, frame[crop], 1 - cls.alpha, 0, dst=result[crop])
+
         # Add text
-        cv2.putText(result, f"{congestion_percentage:.2f}%", 
-                    (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, text_color, 2)
-        
-        return result 
\ No newline at end of file
+        cv2.putText(result, f"{congestion_percentage:.2f}%",
+                    (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, cls.text_color, 2)
+
+        return result
+
+    @classmethod
+    def get_buffers(cls, camera_id: str, shape: Tuple[int, ...]) -> RenderBuffers:
+        with cls._buffers_lock:
+            buffers = cls._buffers.get(camera_id)
+            if buffers is None or buffers.output.shape != shape:
+                buffers = cls._buffers[camera_id] = RenderBuffers(shape)
+            cls._buffers.move_to_end(camera_id)
+            while len(cls._buffers) > cls.max_buffered_cameras:
+                cls._buffers.popitem(last=False)
+            return buffers
+
+    @classmethod
+    def render_jpeg(cls, camera_id: str, frame: np.ndarray,
+                    roi_coordinates: List[Tuple[int, int]],
+                    processed_segments: List[np.ndarray],
+                    congestion_percentage: float,
+                    union_mask: Optional[np.ndarray] = None,
+                    quality: int = 90, max_width: Optional[int] = None) -> bytes:
+        """Render into the camera's scratch buffers and return the encoded JPEG"""
+        buffers = cls.get_buffers(camera_id, frame.shape)
+        with buffers.lock:
+            with time_stage('render'):
+                result = cls.draw_results(frame, roi_coordinates, processed_segments,
+                                          congestion_percentage, union_mask, buffers)
+            with time_stage('encode'):
+                return cls.encode_jpeg(result, quality, max_width)
+
+    @staticmethod
+    def encode_jpeg(image: np.ndarray, quality: int = 90, max_width: Optional[int] = None) -> bytes:
+        """Encode image as JPEG, downscaled to at most max_width pixels wide"""
+        if max_width and image.shape[1] > max_width:
+            scale = max_width / image.shape[1]
+            image = cv2.resize(image, (max_width, max(int(round(image.shape[0] * scale)), 1)),
+                               interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise Exception("Failed to encode image")
+        return encoded.tobytes()